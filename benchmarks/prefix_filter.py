@@ -0,0 +1,92 @@
+"""Compares the cached `PrefixCache.matcher` pre-filter with rebuilding `when_mentioned_or` per message.
+
+    python benchmarks/prefix_filter.py [--messages stream.jsonl] [--count 200000]
+
+`--messages` takes a recorded stream, one JSON object per line with `guild_id` and `content`.
+Without it a synthetic stream is used, where about 2% of messages are commands and some chatter
+starts with the prefix without being one ("'tis").
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discord.ext import commands  # noqa: E402
+from src.utils import PrefixCache  # noqa: E402
+
+BOT_ID = 980092225960702012
+
+
+def synthetic_stream(count: int, guilds: int = 200) -> list[tuple[int, str]]:
+    rng = random.Random(0)
+    chatter = ["lol", "good morning", "did anyone see the match yesterday?", "https://example.com/some/link",
+               "ok", "x" * 300, "brb", "<@123456789012345678> look at this", "'tis the season"]
+    command_words = ["play never gonna give you up", "q", "skip", "np", "volume 80", "pause"]
+    stream = []
+    for _ in range(count):
+        guild_id = rng.randrange(guilds)
+        roll = rng.random()
+        if roll < 0.015:
+            content = "'" + rng.choice(command_words)
+        elif roll < 0.02:
+            content = f"<@{BOT_ID}> " + rng.choice(command_words)
+        else:
+            content = rng.choice(chatter)
+        stream.append((guild_id, content))
+    return stream
+
+
+def load_stream(path: str | None, count: int) -> list[tuple[int, str]]:
+    if path is None:
+        return synthetic_stream(count)
+    with open(path, encoding="utf-8") as f:
+        stream = [(int(m.get("guild_id") or 0), m["content"]) for m in map(json.loads, f) if m.get("content")]
+    return (stream * (count // len(stream) + 1))[:count]
+
+
+def bench_when_mentioned_or(stream, bot) -> tuple[float, int]:
+    # the previous get_prefix + get_context check, for every message
+    matched = 0
+    start = time.perf_counter()
+    for guild_id, content in stream:
+        message = SimpleNamespace(content=content, guild=SimpleNamespace(id=guild_id))
+        prefixes = commands.when_mentioned_or("'")(bot, message)
+        matched += content.startswith(tuple(prefixes))
+    return time.perf_counter() - start, matched
+
+
+def bench_matcher(stream, cache: PrefixCache) -> tuple[float, int]:
+    # Tune.on_message
+    matched = 0
+    start = time.perf_counter()
+    for guild_id, content in stream:
+        matched += content.startswith(cache.matcher(guild_id, BOT_ID))
+    return time.perf_counter() - start, matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", help="recorded stream, one {\"guild_id\", \"content\"} object per line")
+    parser.add_argument("--count", type=int, default=200_000)
+    args = parser.parse_args()
+
+    stream = load_stream(args.messages, args.count)
+    bot = SimpleNamespace(user=SimpleNamespace(id=BOT_ID))
+    cache = PrefixCache()
+
+    old, old_matched = bench_when_mentioned_or(stream, bot)
+    new, new_matched = bench_matcher(stream, cache)
+    assert old_matched == new_matched, "both filters must accept the same messages"
+
+    print(f"{len(stream)} messages, {new_matched} passed the pre-filter")
+    print(f"{'when_mentioned_or':<20}{old * 1e9 / len(stream):>10.0f} ns/msg")
+    print(f"{'PrefixCache.matcher':<20}{new * 1e9 / len(stream):>10.0f} ns/msg  ({old / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
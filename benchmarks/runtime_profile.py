@@ -0,0 +1,192 @@
+"""Compares the default and the fast (FAST_RUNTIME=1) runtime profiles.
+
+Measures gateway-event throughput (decode + dispatch of every frame) and per-command latency
+(decode a MESSAGE_CREATE, PATCH a player on a local Lavalink stand-in, decode the response).
+
+    python benchmarks/runtime_profile.py [--payloads frames.jsonl] [--events 50000] [--commands 2000]
+
+`--payloads` takes recorded raw frames, one per line (gateway and Lavalink websocket messages as received).
+Without it a synthetic mix of the frames Tune sees most is used. Each profile runs in its own process,
+since the loop policy and the JSON codec are process wide. The default profile pins discord.py to the
+stdlib json, which it otherwise swaps for orjson on its own whenever orjson is installed.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from statistics import mean, quantiles
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_frames(count: int) -> list[str]:
+    rng = random.Random(0)
+    author = {"id": "111", "username": "listener", "discriminator": "0", "avatar": None, "bot": False}
+    frames = []
+    for seq in range(count):
+        kind = rng.random()
+        if kind < 0.5:
+            data = {"op": 0, "s": seq, "t": "MESSAGE_CREATE", "d": {
+                "id": str(10 ** 17 + seq), "channel_id": "222", "guild_id": "333", "author": author,
+                "content": rng.choice(["hello", "'play never gonna give you up", "lol", "'q", "x" * 200]),
+                "timestamp": "2024-01-01T00:00:00+00:00", "tts": False, "mention_everyone": False,
+                "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0}}
+        elif kind < 0.75:
+            data = {"op": 0, "s": seq, "t": "PRESENCE_UPDATE", "d": {
+                "user": {"id": str(seq)}, "guild_id": "333", "status": "online", "client_status": {"desktop": "online"},
+                "activities": [{"name": "Tune", "type": 2, "created_at": 1700000000000}]}}
+        elif kind < 0.85:
+            data = {"op": 0, "s": seq, "t": "VOICE_STATE_UPDATE", "d": {
+                "guild_id": "333", "channel_id": "444", "user_id": str(seq), "session_id": "abc" * 10,
+                "deaf": False, "mute": False, "self_deaf": False, "self_mute": False, "suppress": False}}
+        elif kind < 0.97:
+            data = {"op": "playerUpdate", "guildId": "333",
+                    "state": {"time": 1700000000000 + seq, "position": seq * 5000, "connected": True, "ping": 42}}
+        else:
+            data = {"op": "stats", "players": 12, "playingPlayers": 9, "uptime": seq * 60000,
+                    "memory": {"free": 1, "used": 2, "allocated": 3, "reservable": 4},
+                    "cpu": {"cores": 4, "systemLoad": 0.2, "lavalinkLoad": 0.1},
+                    "frameStats": {"sent": 3000, "nulled": 0, "deficit": 0}}
+        frames.append(json.dumps(data))
+    return frames
+
+
+def load_frames(path: str | None, count: int) -> list[str]:
+    if path is None:
+        return synthetic_frames(count)
+    with open(path, encoding="utf-8") as f:
+        frames = [line.strip() for line in f if line.strip()]
+    return (frames * (count // len(frames) + 1))[:count]
+
+
+async def gateway_throughput(frames: list[str]) -> float:
+    import discord
+
+    handled = 0
+
+    async def handle(data: dict):
+        nonlocal handled
+        await asyncio.sleep(0)
+        handled += 1
+
+    queue: asyncio.Queue[str | None] = asyncio.Queue()
+
+    async def consume():
+        tasks = set()
+        while (raw := await queue.get()) is not None:
+            # same path as discord.py's gateway: decode, then a task per dispatched event
+            task = asyncio.create_task(handle(discord.utils._from_json(raw)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    start = time.perf_counter()
+    consumer = asyncio.create_task(consume())
+    for raw in frames:
+        queue.put_nowait(raw)
+        if queue.qsize() >= 256:
+            await asyncio.sleep(0)
+    queue.put_nowait(None)
+    await consumer
+    return handled / (time.perf_counter() - start)
+
+
+async def command_latency(frames: list[str], count: int) -> list[float]:
+    import discord
+    from aiohttp import web
+    from src.utils import lavalink_session
+
+    async def update_player(request: web.Request):
+        data = await request.json()
+        return web.json_response({"guildId": request.match_info["guild"], "volume": data.get("volume", 100),
+                                  "paused": False, "filters": {}, "voice": {}, "state": {"position": 0}})
+
+    app = web.Application()
+    app.router.add_patch("/v4/sessions/bench/players/{guild}", update_player)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    messages = [raw for raw in frames if '"MESSAGE_CREATE"' in raw] or frames
+    session = lavalink_session("bench")
+    latencies = []
+    try:
+        for i in range(count):
+            start = time.perf_counter()
+            message = discord.utils._from_json(messages[i % len(messages)])
+            guild = message.get("d", {}).get("guild_id", "333")
+            async with session.patch(f"http://127.0.0.1:{port}/v4/sessions/bench/players/{guild}",
+                                     json={"volume": i % 200, "paused": False}) as resp:
+                await resp.json()
+            latencies.append(time.perf_counter() - start)
+    finally:
+        await session.close()
+        await runner.cleanup()
+    return latencies
+
+
+def run_profile(args) -> dict:
+    runtime = {"loop": "asyncio", "json": "json"}
+    if args.profile == "fast":
+        from src.utils import install_fast_runtime
+        runtime = install_fast_runtime()
+    else:
+        import discord
+        # discord.py binds orjson by itself when it's installed, the baseline is the stdlib
+        discord.utils._from_json = json.loads
+        discord.utils._to_json = lambda obj: json.dumps(obj, separators=(',', ':'), ensure_ascii=True)
+
+    frames = load_frames(args.payloads, args.events)
+
+    async def main():
+        # warm up both paths before measuring
+        await gateway_throughput(frames[:1000])
+        await command_latency(frames, 50)
+        return await gateway_throughput(frames), await command_latency(frames, args.commands)
+
+    throughput, latencies = asyncio.run(main())
+    cuts = quantiles(latencies, n=100)
+    return {
+        "profile": f"{args.profile} ({runtime['loop']} + {runtime['json']})",
+        "events_per_s": throughput,
+        "cmd_avg_ms": mean(latencies) * 1000,
+        "cmd_p50_ms": cuts[49] * 1000,
+        "cmd_p95_ms": cuts[94] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payloads", help="recorded raw frames, one per line")
+    parser.add_argument("--events", type=int, default=50_000)
+    parser.add_argument("--commands", type=int, default=2_000)
+    parser.add_argument("--profile", choices=("default", "fast"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(run_profile(args)))
+        return
+
+    results = []
+    for profile in ("default", "fast"):
+        cmd = [sys.executable, __file__, "--profile", profile, "--events", str(args.events),
+               "--commands", str(args.commands)]
+        if args.payloads:
+            cmd += ["--payloads", args.payloads]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    print(f"{'profile':<32}{'events/s':>12}{'cmd avg':>10}{'cmd p50':>10}{'cmd p95':>10}")
+    for r in results:
+        print(f"{r['profile']:<32}{r['events_per_s']:>12.0f}{r['cmd_avg_ms']:>8.2f}ms"
+              f"{r['cmd_p50_ms']:>8.2f}ms{r['cmd_p95_ms']:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
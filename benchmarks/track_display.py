@@ -0,0 +1,99 @@
+"""Compares the lazy `parsed_duration` + progress bar table with the previous eager duration + `splitBar` per call.
+
+    python benchmarks/track_display.py [--tracks 10000] [--embeds 1000]
+
+Enqueues `--tracks` tracks (most are never shown, like an auto-queue or a playlist), then renders
+`--embeds` "Now Playing!" embeds twice (the first render formats the lazy duration) and `'nowplaying`
+embeds, each followed by `to_dict()` as when it is sent.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wavelink import Queue  # noqa: E402
+from StringProgressBar import progressBar  # noqa: E402
+from src.cogs.music import TTrack  # noqa: E402
+
+
+class EagerTrack(TTrack):
+    """The track before the lazy duration: parsed on creation, and a progress bar computed per call."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.__dict__["parsed_duration"] = self.parse_duration(self.length / 1000)
+
+    def now_playing_embed(self, played: int):
+        embed = self.track_embed()
+        embed.insert_field_at(index=1, name="Played", value=self.parse_duration(played), inline=False)
+        progress_bar = progressBar.splitBar(int(self.duration / 1000), played, size=12)[0]
+        embed.insert_field_at(index=2, name="", value=progress_bar, inline=False)
+        return embed
+
+
+def track_payloads(count: int) -> list[dict]:
+    rng = random.Random(0)
+    payloads = []
+    for i in range(count):
+        identifier = f"vid{i:08d}"
+        payloads.append({"encoded": f"QAAA{i:012d}" * 8, "info": {
+            "identifier": identifier, "isSeekable": True, "author": f"Channel {i % 300}",
+            "length": rng.randrange(60_000, 600_000), "isStream": False, "position": 0,
+            "title": f"Track number {i} (Official Video)", "uri": f"https://www.youtube.com/watch?v={identifier}",
+            "sourceName": "youtube", "artworkUrl": None, "isrc": None}})
+    return payloads
+
+
+def enqueue(cls, payloads, ctx) -> tuple[float, Queue]:
+    queue = Queue()
+    start = time.perf_counter()
+    for data in payloads:
+        track = cls(data)
+        track.ctx_ = ctx
+        track.thumb = f"https://img.youtube.com/vi/{track.identifier}/maxresdefault.jpg"
+        queue.put(track)
+    return time.perf_counter() - start, queue
+
+
+def render(queue: Queue, count: int) -> tuple[float, float, float]:
+    tracks = [queue[i % len(queue)] for i in range(count)]
+    timings = []
+    # the first render of a track also computes its lazy display fields
+    for _ in range(2):
+        start = time.perf_counter()
+        for track in tracks:
+            track.track_embed().to_dict()
+        timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    for i, track in enumerate(tracks):
+        track.now_playing_embed(i % max(int(track.duration / 1000), 1)).to_dict()
+    timings.append(time.perf_counter() - start)
+    return tuple(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=10_000)
+    parser.add_argument("--embeds", type=int, default=1_000)
+    args = parser.parse_args()
+
+    payloads = track_payloads(args.tracks)
+    ctx = SimpleNamespace(author=SimpleNamespace(mention="<@123456789012345678>"))
+
+    results = {}
+    for name, cls in (("eager + splitBar", EagerTrack), ("lazy + bar table", TTrack)):
+        enqueued, queue = enqueue(cls, payloads, ctx)
+        results[name] = (enqueued, *render(queue, args.embeds))
+
+    print(f"{args.tracks} tracks enqueued, {args.embeds} embeds of each kind rendered")
+    print(f"{'':<24}{'enqueue':>12}{'embed 1st':>12}{'embed again':>12}{'now_playing':>12}{'total':>12}")
+    for name, timings in results.items():
+        print(f"{name:<24}" + "".join(f"{t * 1000:>10.2f}ms" for t in (*timings, sum(timings))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import time
+import asyncio
+from datetime import datetime
+
+import discord
+from discord.ext import commands
+from discord.ext.commands import Context
+from discord.ext.commands._types import BotT
+
+EMBED_COLOR = discord.Color.dark_grey()
+
+
+class DebugCog(commands.Cog, name='Debug'):
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.monitor = bot.monitor
+
+    async def cog_check(self, ctx: Context[BotT]) -> bool:
+        if not await self.bot.is_owner(ctx.author):
+            raise commands.NotOwner("You do not own this bot.")
+        return True
+
+    @commands.command(name="loopstats", aliases=['lag'])
+    async def _loop_stats(self, ctx: Context):
+        stats = self.monitor.lag_stats()
+        embed = (discord.Embed(
+            title="Event loop",
+            color=EMBED_COLOR
+        )
+                 .add_field(name="Samples", value=stats["samples"])
+                 .add_field(name="Avg lag", value=f"{stats['avg'] * 1000:.2f} ms")
+                 .add_field(name="P95 lag", value=f"{stats['p95'] * 1000:.2f} ms")
+                 .add_field(name="Max lag", value=f"{stats['max'] * 1000:.2f} ms")
+                 .add_field(name="Gateway", value=f"{self.bot.latency * 1000:.2f} ms")
+                 .add_field(name="Blocked", value=len(self.monitor.slow_stacks)))
+        if self.monitor.slow_stacks:
+            at, blocked, stack = self.monitor.slow_stacks[-1]
+            embed.add_field(
+                name=f"Last block: {blocked * 1000:.0f} ms at <t:{int(at)}:T>",
+                value=f"```{stack[-1000:]}```",
+                inline=False
+            )
+        return await ctx.send(embed=embed)
+
+    @commands.command(name="tasks")
+    async def _tasks(self, ctx: Context):
+        counts = self.monitor.task_counts()
+        desc = "\n".join(f"`{count:>4}` {name}" for name, count in counts.most_common(20))
+        return await ctx.send(embed=discord.Embed(
+            title=f"Tasks ({sum(counts.values())})",
+            description=desc,
+            color=EMBED_COLOR
+        ))
+
+    @commands.command(name="listeners")
+    async def _listeners(self, ctx: Context):
+        listeners = sorted(self.monitor.listeners.items(), key=lambda i: i[1][1], reverse=True)
+        desc = "\n".join(
+            f"**{name}**: {calls} calls, avg `{total / calls * 1000:.2f} ms`, max `{peak * 1000:.2f} ms`"
+            for name, (calls, total, peak) in listeners[:20]
+        )
+        return await ctx.send(embed=discord.Embed(
+            title="Listener timings",
+            description=desc or "No events recorded yet.",
+            color=EMBED_COLOR
+        ))
+
+    @commands.command(name="profile")
+    async def _profile(self, ctx: Context, seconds: int = 10):
+        if not 0 < seconds <= 120:
+            return await ctx.send("Profile duration must be from 1-120 seconds.")
+
+        path = f"profile-{datetime.now():%Y%m%d-%H%M%S}.txt"
+        await ctx.send(f"Profiling for {seconds} seconds...")
+        start = time.perf_counter()
+        samples = await asyncio.to_thread(self.monitor.profile, seconds, path)
+        return await ctx.send(embed=discord.Embed(
+            title="Profile captured",
+            description=f"`{samples}` samples in {time.perf_counter() - start:.1f}s -> `{path}`",
+            color=EMBED_COLOR
+        ))
+
+
+async def setup(bot: commands.Bot):
+    # inert unless the monitor is enabled
+    if getattr(bot, "monitor", None) is None:
+        return
+    await bot.add_cog(DebugCog(bot))
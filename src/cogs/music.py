@@ -2,76 +2,320 @@ from __future__ import annotations
 
 import re
 import os
+import copy
+import contextlib
 import yarl
 import asyncio
 import aiohttp
-from typing import Union
+from typing import Any, Union
+from functools import cached_property
+from itertools import islice
 from logging import getLogger
-from ..utils import paginate_items
+from ..utils import (paginate_items, lavalink_session, ChannelSender, Priority, lavalink_scheduler,
+                     request_context, request_guild, AudioCache, PlaybackHealth)
+from ..database.music.utils import PlayHistory
 from StringProgressBar import progressBar
 
 import discord
 from discord.ext import commands
 from discord.ext.commands import Context
 from discord.ext.commands._types import BotT
-from discord import Member, VoiceState, DMChannel, Guild, ButtonStyle, Interaction, Message, Reaction, User
+from discord import (Member, VoiceState, DMChannel, Guild, ButtonStyle, Interaction, InteractionType, Message,
+                     Reaction, User)
 
-from discord.ui import View, Button, button
+from discord.ui import View, Button
 
 from wavelink.types.track import Track
+from wavelink.websocket import Websocket
 from wavelink import (Node, NodePool, Player, Playable, TrackSource, TrackEventPayload,
-                      YouTubeTrack, SoundCloudTrack, YouTubePlaylist)
+                      YouTubeTrack, SoundCloudTrack, YouTubePlaylist, Filter, GenericTrack, NodeStatus,
+                      WebsocketClosedPayload)
 
 logger = getLogger("discord")
 EMBED_COLOR = discord.Color.magenta()
 VIDEO_REGEX = r"((?<=(v|V)/)|(?<=be/)|(?<=(\?|\&)v=)|(?<=embed/))([\w-]+)"
+PROGRESS_SIZE = 12
+# filters enabled in application.yml
+LAVALINK_FILTERS = ("volume", "equalizer", "karaoke", "timescale", "tremolo",
+                    "vibrato", "distortion", "rotation", "channelMix", "lowPass")
+
+PAGE_TITLES = {"queue": "Queue", "autoqueue": "Auto-Queue", "history": "History"}
+
+
+class TWebsocket(Websocket):
+    __slots__ = ()
+
+    def dispatch(self, event, *args, **kwargs) -> None:
+        super().dispatch(event, *args, **kwargs)
+        if event == "stats_update":
+            # wavelink doesn't say which node the stats came from
+            self.node.client.dispatch("wavelink_node_stats", self.node, *args)
+
+
+class TNode(Node):
+    """Node whose REST requests go through the shared `lavalink_scheduler`."""
+
+    @property
+    def _websocket(self) -> Websocket:
+        return self.__websocket
+
+    @_websocket.setter
+    def _websocket(self, websocket: Websocket):
+        # wavelink builds a plain Websocket in _connect, ours replaces it before it connects
+        if type(websocket) is Websocket:
+            websocket = TWebsocket(node=self)
+        self.__websocket = websocket
+
+    async def _send(self, *, method: str, path: str, guild_id: int | str | None = None,
+                    query: str | None = None, data: Any = None) -> dict[str, Any] | None:
+        async with lavalink_scheduler.request(self.id, guild_id=guild_id):
+            return await super()._send(method=method, path=path, guild_id=guild_id, query=query, data=data)
+
+
+class PlayerUpdateBatcher:
+    """Merges the player updates made within `tick` seconds into a single PATCH to Lavalink."""
+
+    def __init__(self, player: TPlayer, tick: float = 0.05):
+        self.player = player
+        self.tick = tick
+        self.sent = 0
+        self.merged = 0
+        self._pending: dict[str, Any] = {}
+        self._waiters: list[asyncio.Future] = []
+        self._task: asyncio.Task | None = None
+
+    def update(self, **data) -> asyncio.Future:
+        # later values overwrite earlier ones, only the latest state is sent
+        self.merged += len(self._waiters) > 0
+        self._pending.update(data)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_later())
+        return waiter
+
+    def discard(self, *keys: str):
+        for key in keys:
+            self._pending.pop(key, None)
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.tick)
+        self._task = None
+        await self.flush()
+
+    async def flush(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        data, self._pending = self._pending, {}
+        waiters, self._waiters = self._waiters, []
+
+        error = None
+        if data:
+            node = self.player.current_node
+            try:
+                await node._send(method='PATCH',
+                                 path=f'sessions/{node._session_id}/players',
+                                 guild_id=self.player.guild.id,
+                                 data=data)
+            except Exception as e:
+                logger.error(f"Player update failed for guild {self.player.guild.id}: {e}")
+                error = e
+            else:
+                self.sent += 1
+
+        for waiter in waiters:
+            if waiter.done():
+                continue
+            if error is None:
+                waiter.set_result(None)
+            else:
+                waiter.set_exception(error)
+
+    async def skip(self):
+        # a pending seek is meaningless once the track is gone
+        self.discard("position")
+        waiter = self.update(encodedTrack=None)
+        await self.flush()
+        await waiter
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._pending.clear()
+        # the player is gone, there is nothing left to apply the updates to
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
 
 
 class TPlayer(Player):
+    audio_cache: AudioCache | None = None
+    health: PlaybackHealth | None = None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.autoplay = True
         self.populate = False
+        self.populate_message: asyncio.Future | None = None
+        self.updates = PlayerUpdateBatcher(self)
+        self._sent_paused = False
 
     async def destroy(self):
+        self.updates.close()
+        if self.health is not None and self.guild is not None:
+            self.health.forget_player(self.guild.id)
         if self.is_connected():
             await self.disconnect()
         await self._destroy()
 
-    def item_string(self, page: int, items: list[TTrack]):
+    async def play(self, track: Playable, *args, **kwargs) -> Playable:
+        # a new track replaces whatever position / stop was still pending
+        self.updates.discard("position", "encodedTrack")
+        if self.audio_cache is not None and isinstance(track, TTrack):
+            track = await self.cached_track(track)
+        return await super().play(track, *args, **kwargs)
+
+    async def move_to_node(self, node: Node):
+        old = self.current_node
+        if node is old:
+            return
+        # like wavelink's swap on disconnect, but the new node also needs the volume, filters and pause state
+        data = {"volume": self._volume, "paused": self._paused}
+        if self._player_state.get('voice') is not None:
+            data["voice"] = self._player_state['voice']
+        if self._filter is not None:
+            data["filters"] = self.filter_payload(self._filter)
+        if self._player_state.get('track') is not None:
+            data["encodedTrack"] = self._player_state['track']
+            data["position"] = int(self.position)
+        await node._send(method='PATCH', path=f'sessions/{node._session_id}/players', guild_id=self.guild.id,
+                         data=data)
+
+        # only switch over once the new node has the player
+        old._players.pop(self.guild.id, None)
+        self.current_node = node
+        node._players[self.guild.id] = self
+        try:
+            await old._send(method='DELETE', path=f'sessions/{old._session_id}/players', guild_id=self.guild.id)
+        except Exception as e:
+            # the old node is usually the unhealthy one, the player has moved either way
+            logger.warning(f"Moved player {self.guild.id} off node {old.id}, but removing it there failed: {e}")
+
+    async def cached_track(self, track: TTrack) -> TTrack:
+        source = self.audio_cache.source(track.identifier)
+        if source is None:
+            return track
+        try:
+            tracks = await self.current_node.get_tracks(cls=GenericTrack, query=source)
+        except Exception as e:
+            logger.warning(f"Cached audio for {track.identifier} failed to load: {e}")
+            tracks = None
+        if not tracks:
+            # streamed as usual, not a hit
+            self.audio_cache.record_miss()
+            return track
+        await self.audio_cache.record_hit(track.identifier)
+        # same track for display, only the audio comes from the cache
+        cached = copy.copy(track)
+        cached.encoded = tracks[0].encoded
+        return cached
+
+    async def set_volume(self, value: int) -> None:
+        self._volume = max(min(value, 1000), 0)
+        await self.updates.update(volume=self._volume)
+
+    async def seek(self, position: int) -> None:
+        if not self._current:
+            return
+        await self.updates.update(position=position)
+
+    async def pause(self) -> None:
+        await self._set_paused(True)
+
+    async def resume(self) -> None:
+        await self._set_paused(False)
+
+    async def _set_paused(self, paused: bool):
+        # set right away so is_paused() reflects the command, Lavalink gets it with the next batch
+        self._paused = paused
+        try:
+            await self.updates.update(paused=paused)
+        except Exception:
+            # never reached Lavalink, report what it is still doing
+            self._paused = self._sent_paused
+            raise
+        self._sent_paused = paused
+
+    @staticmethod
+    def filter_payload(_filter: Filter) -> dict[str, Any]:
+        return {k: v for k, v in _filter._payload.items() if k in LAVALINK_FILTERS}
+
+    async def set_filter(self, _filter: Filter, /, *, seek: bool = False) -> None:
+        self._filter = _filter
+        data = {"filters": self.filter_payload(_filter)}
+        if self.is_playing() and seek:
+            data["position"] = int(self.position)
+        await self.updates.update(**data)
+
+    async def stop(self, *, force: bool = True) -> None:
+        if force:
+            self.queue._loaded = None
+        self._player_state['track'] = None
+        await self.updates.skip()
+
+    async def skip(self):
+        await self.stop(force=True)
+
+    def item_string(self, page: int, items):
+        # only the shown page is walked, the queue isn't copied
         start, end, pages = paginate_items(items, page)
-        _queue = ''
-        for i, track in enumerate(items[start:end], start=start + 1):
-            _queue += f"`{i}.` **[{track.title}]({track.uri})**" + "\n"
+        _queue = "\n".join(f"`{i}.` **[{track.title}]({track.uri})**"
+                           for i, track in enumerate(islice(items, start, end), start=start + 1))
         return _queue, pages
 
-    def queue_embed(self, page: int = 1):
-        items: list[TTrack] = [i for i in self.queue]
+    def page_embed(self, kind: str, items, page: int):
         _queue, pages = self.item_string(page, items)
-        return (discord.Embed(title="Queue", description=_queue, color=EMBED_COLOR)
+        return (discord.Embed(title=PAGE_TITLES[kind], description=_queue, color=EMBED_COLOR)
                 .set_footer(text=f"Page {page}/{pages}"), pages)
 
+    def queue_embed(self, page: int = 1):
+        return self.page_embed("queue", self.queue, page)
+
     def auto_queue_embed(self, page: int = 1):
-        items: list[TTrack] = [i for i in self.auto_queue]
-        _queue, pages = self.item_string(page, items)
-        return (discord.Embed(title="Auto-Queue", description=_queue, color=EMBED_COLOR)
-                .set_footer(text=f"Page {page}/{pages}"), pages)
+        return self.page_embed("autoqueue", self.auto_queue, page)
 
     def history_embed(self, page: int = 1):
-        items: list[TTrack] = [i for i in self.queue.history]
-        _queue, pages = self.item_string(page, items)
-        return (discord.Embed(title="History", description=_queue, color=EMBED_COLOR)
-                .set_footer(text=f"Page {page}/{pages}"), pages)
+        return self.page_embed("history", self.queue.history, page)
+
+    def paginated(self, kind: str):
+        return {
+            "queue": (self.queue, self.queue_embed),
+            "history": (self.queue.history, self.history_embed),
+            "autoqueue": (self.auto_queue, self.auto_queue_embed)
+        }[kind]
 
     async def populate_auto_queue(self, ctx: Context, track: TTrack):
         if not self.populate:
             return
+        if self.health is not None and self.health.throttled(self.current_node.id):
+            logger.info(f"Node {self.current_node.id} is dropping frames, skipped populating the auto-queue.")
+            return
+
+        # mix fetches and their thumbnails must not hold up interactive requests
+        with request_context(Priority.BACKGROUND, ctx.guild.id):
+            await self._populate_auto_queue(ctx, track)
 
+    async def _populate_auto_queue(self, ctx: Context, track: TTrack):
         if track.source == TrackSource.YouTube:
             query = f'https://www.youtube.com/watch?v={track.identifier}&list=RD{track.identifier}'
             recos: YouTubePlaylist = await self.current_node.get_playlist(query=query, cls=YouTubePlaylist)
 
-            ctx.bot.dispatch("populate", ctx=ctx, playlist_name=recos.name, playlist_url=query)
+            # created here, so the done event below always gets this populate's message
+            message = self.populate_message = asyncio.get_running_loop().create_future()
+            ctx.bot.dispatch("populate", ctx=ctx, playlist_name=recos.name, playlist_url=query, message=message)
 
             recos: list[YouTubeTrack] = getattr(recos, "tracks", [])
             queues = set(self.queue) | set(self.auto_queue) | set(self.auto_queue.history) | {track}
@@ -82,7 +326,7 @@ class TPlayer(Player):
                 await self.auto_queue.put_wait(await TTrack.from_track(ctx, track_.data))
             self.auto_queue.shuffle()
 
-            ctx.bot.dispatch("populate_done", message=self.populate_message)
+            ctx.bot.dispatch("populate_done", message=message)
 
     async def start_player(self):
         if not self.is_playing() and not self.is_paused():
@@ -98,9 +342,14 @@ class TTrack(Playable):
     def __init__(self, data: Track):
         super().__init__(data)
         self.thumb = None
-        self.parsed_duration: str = self.parse_duration(self.length / 1000)
         self.ctx_: Context | None = None
 
+    # most tracks (auto-queue, playlists) are never shown, so the duration is formatted on first use
+
+    @cached_property
+    def parsed_duration(self) -> str:
+        return self.parse_duration(self.length / 1000)
+
     @staticmethod
     def parse_duration(duration):
         minutes, seconds = divmod(duration, 60)
@@ -137,7 +386,9 @@ class TTrack(Playable):
 
     async def fetch_thumbnail(self):
         if self.source == TrackSource.YouTube:
-            self.thumb = await YouTubeTrack.fetch_thumbnail(self)
+            node = NodePool.get_node()
+            async with lavalink_scheduler.request(node.id):
+                self.thumb = await YouTubeTrack.fetch_thumbnail(self, node=node)
         elif self.source == TrackSource.SoundCloud:
             self.thumb = ("https://r1.hiclipart.com/path/310/259/692/ksnhqtqg0mddtjejjea3rprovf"
                           "-8f54861ffbc19d4eb264ce3a6740cdd6.png")
@@ -184,6 +435,13 @@ class TTrack(Playable):
                 .add_field(name="Uploader", value=self.author)
                 .set_thumbnail(url=self.thumb))
 
+    def now_playing_embed(self, played: int):
+        embed = self.track_embed()
+        embed.insert_field_at(index=1, name="Played", value=self.parse_duration(played), inline=False)
+        embed.insert_field_at(index=2, name="", value=MusicUtils.progress_bar(int(self.duration / 1000), played),
+                              inline=False)
+        return embed
+
 
 class Query:
 
@@ -258,49 +516,55 @@ class MusicUtils:
         "4️⃣": 3,
         "5️⃣": 4
     }
+    # every bar splitBar can produce at PROGRESS_SIZE, the last one is past the end
+    PROGRESS_BARS = [progressBar.splitBar(PROGRESS_SIZE, i, size=PROGRESS_SIZE)[0] for i in range(PROGRESS_SIZE + 2)]
 
+    @staticmethod
+    def progress_bar(total: int, current: int) -> str:
+        if current > total:
+            return MusicUtils.PROGRESS_BARS[-1]
+        if total <= 0:
+            return MusicUtils.PROGRESS_BARS[0]
+        return MusicUtils.PROGRESS_BARS[round(PROGRESS_SIZE * current / total)]
 
-class PaginationUI(View):
-    def __init__(self, pages: int, func):
-        super().__init__(timeout=60 * 2)
-        self.current = 1
-        self.pages = pages
-        self.func = func
-
-    async def on_timeout(self) -> None:
-        for item in self.children:
-            item.disabled = True
-        await self.message.edit(view=self)
-
-    @button(label=MusicEmojis.PREVIOUS, style=ButtonStyle.red)
-    async def prev_button_callback(self, interaction: Interaction, button: Button):
-        if self.current == self.pages == 1:
-            return await interaction.response.send_message("No previous page!", delete_after=10)
-        await interaction.response.defer()
-        if self.current == 1:
-            self.current = self.pages
-        else:
-            self.current = self.current - 1
-        embed, self.pages = self.func(self.current)
-        await interaction.followup.edit_message(message_id=interaction.message.id, embed=embed)
-
-    @button(label=MusicEmojis.NEXT, style=ButtonStyle.red)
-    async def next_button_callback(self, interaction: Interaction, button: Button):
-        if self.current == self.pages == 1:
-            return await interaction.response.send_message("No next page!", delete_after=10)
-        await interaction.response.defer()
-        if self.current == self.pages:
-            self.current = 1
-        else:
-            self.current = self.current + 1
-        embed, self.pages = self.func(self.current)
-        await interaction.followup.edit_message(message_id=interaction.message.id, embed=embed)
+
+class PaginationUI:
+    """Builds stateless pagination buttons, clicks are handled by `MusicCog.on_interaction`.
+
+    The custom id carries everything needed to render the next page: `page:<guild>:<kind>:<page>:<direction>`.
+    """
+    PREFIX = "page:"
+    KINDS = ("queue", "history", "autoqueue")
+
+    @classmethod
+    def view(cls, guild_id: int, kind: str, page: int) -> View:
+        view = View(timeout=None)
+        view.add_item(Button(label=MusicEmojis.PREVIOUS, style=ButtonStyle.red,
+                             custom_id=f"{cls.PREFIX}{guild_id}:{kind}:{page}:previous"))
+        view.add_item(Button(label=MusicEmojis.NEXT, style=ButtonStyle.red,
+                             custom_id=f"{cls.PREFIX}{guild_id}:{kind}:{page}:next"))
+        # a finished view is not kept in the view store, so nothing lives on per message
+        view.stop()
+        return view
+
+    @classmethod
+    def parse(cls, custom_id: str) -> tuple[int, str, int, str] | None:
+        try:
+            guild_id, kind, page, direction = custom_id.removeprefix(cls.PREFIX).split(":")
+            if kind not in cls.KINDS or direction not in ("previous", "next"):
+                return None
+            return int(guild_id), kind, int(page), direction
+        except ValueError:
+            return None
 
 
 class MusicCog(commands.Cog, name='Music'):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.sender = ChannelSender()
+        self.history: PlayHistory | None = None
+        self.health = TPlayer.health = PlaybackHealth()
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: Member, before: VoiceState, after: VoiceState):
@@ -317,23 +581,128 @@ class MusicCog(commands.Cog, name='Music'):
     async def on_wavelink_node_ready(self, node: Node):
         logger.info(f"Wavelink node {node.id} ready.")
 
+    @commands.Cog.listener()
+    async def on_wavelink_node_stats(self, node: Node, data: dict):
+        previous = self.health.node_state(node.id)
+        state = self.health.node_stats(node.id, data)
+        if state == previous:
+            return
+        logger.warning(f"Wavelink node {node.id} is {state}: {self.health.frame_loss(node.id) * 100:.1f}% frames lost.")
+        if state == "critical":
+            await self.rebalance(node)
+
+    async def rebalance(self, node: Node):
+        targets = [n for n in NodePool.nodes.values()
+                   if n is not node and n.status is NodeStatus.CONNECTED and not self.health.throttled(n.id)]
+        if not targets:
+            logger.warning(f"No healthy node to move players off {node.id}, only throttling the auto-queue.")
+            return
+        players: list[TPlayer] = sorted(node.players.values(), key=lambda p: self.health.player_drift(p.guild.id),
+                                        reverse=True)
+        # the worst half, moving everything would just overload the target
+        for player in players[:max(len(players) // 2, 1)]:
+            target = min(targets, key=lambda n: len(n.players))
+            try:
+                await player.move_to_node(target)
+            except Exception as e:
+                logger.error(f"Failed to move player {player.guild.id} to node {target.id}: {e}")
+                continue
+            self.health.event(player.guild.id, "moved", f"{node.id} -> {target.id}")
+
+    @commands.Cog.listener()
+    async def on_wavelink_player_update(self, data: dict):
+        guild = self.bot.get_guild(int(data['guildId']))
+        player: TPlayer | None = guild.voice_client if guild else None
+        if player is None:
+            return
+        # a paused player's position doesn't move, that isn't drift
+        self.health.player_update(guild.id, player.current_node.id, data['state'],
+                                  player.is_playing() and not player.is_paused())
+
+    @commands.Cog.listener()
+    async def on_wavelink_websocket_closed(self, payload: WebsocketClosedPayload):
+        if payload.player is None or payload.player.guild is None:
+            return
+        self.health.event(payload.player.guild.id, "websocket_closed",
+                          f"{payload.code.name} ({payload.reason}), by discord: {payload.by_discord}")
+
+    @commands.Cog.listener()
+    async def on_wavelink_track_event(self, payload: TrackEventPayload):
+        # stuck / exception events only come through the generic track event
+        if payload.event.value not in ("TrackStuckEvent", "TrackExceptionEvent"):
+            return
+        logger.warning(f"{payload.event.value} in guild {payload.player.guild.id}: {payload.track.title}")
+        self.health.event(payload.player.guild.id, payload.event.value, payload.track.title)
+
     @commands.Cog.listener()
     async def on_wavelink_track_start(self, payload: TrackEventPayload):
         track: TTrack = payload.original
-        await track.ctx_.channel.send(embed=track.track_embed())
+        self.record_event(payload.player, "start", track)
+        if TPlayer.audio_cache is not None:
+            TPlayer.audio_cache.record_play(track.identifier, track.uri)
+        await self.sender.send(track.ctx_.channel, track.track_embed(), key="now_playing")
+
+    @commands.Cog.listener()
+    async def on_wavelink_track_end(self, payload: TrackEventPayload):
+        track = payload.original or payload.track
+        position = track.length if payload.reason == "FINISHED" else 0
+        self.record_event(payload.player, "end", track, position, payload.reason)
+
+    def record_event(self, player: Player, event: str, track: Playable, position: float = 0, reason: str = None):
+        if self.history is None or player.guild is None:
+            return
+        ctx: Context | None = getattr(track, "ctx_", None)
+        self.history.record(player.guild.id, event, track.identifier, track.title, track.uri,
+                            ctx.author.id if ctx else None, position, reason)
 
     @commands.Cog.listener()
-    async def on_populate(self, ctx: Context, playlist_name: str, playlist_url: str):
+    async def on_interaction(self, interaction: Interaction):
+        if interaction.type != InteractionType.component:
+            return
+        custom_id = interaction.data.get("custom_id", "")
+        if not custom_id.startswith(PaginationUI.PREFIX):
+            return
+        parsed = PaginationUI.parse(custom_id)
+        if parsed is None:
+            return
+        guild_id, kind, page, direction = parsed
+
+        player: TPlayer | None = None
+        if interaction.guild is not None and interaction.guild.id == guild_id:
+            player = self.get_player(interaction.guild)
+        if not player:
+            return await interaction.response.send_message("Not connected to a VC.", delete_after=10)
+
+        items, func = player.paginated(kind)
+        _, _, pages = paginate_items(items)
+        if pages <= 1:
+            return await interaction.response.send_message(f"No {direction} page!", delete_after=10)
+
+        page = (page - 1 + (1 if direction == "next" else -1)) % pages + 1
+        embed, _ = func(page)
+        await interaction.response.edit_message(embed=embed, view=PaginationUI.view(guild_id, kind, page))
+
+    @commands.Cog.listener()
+    async def on_populate(self, ctx: Context, playlist_name: str, playlist_url: str, message: asyncio.Future):
         logger.info(f"Populating: {playlist_url}")
-        player: TPlayer = ctx.guild.voice_client
-        player.populate_message = await ctx.send(embed=discord.Embed(
-            title="Populating auto-queue",
-            description=f"**[{playlist_name}]({playlist_url})**",
-            color=EMBED_COLOR
-        ).set_footer(text="Note: Queue takes precedence over Auto-Queue"))
+        sent: Message | None = None
+        try:
+            sent = await self.sender.send(ctx.channel, discord.Embed(
+                title="Populating auto-queue",
+                description=f"**[{playlist_name}]({playlist_url})**",
+                color=EMBED_COLOR
+            ).set_footer(text="Note: Queue takes precedence over Auto-Queue"), key="populate")
+        except discord.HTTPException:
+            pass  # already logged by the sender
+        finally:
+            if not message.done():
+                message.set_result(sent)
 
     @commands.Cog.listener()
-    async def on_populate_done(self, message: Message):
+    async def on_populate_done(self, message: asyncio.Future):
+        message: Message | None = await message
+        if message is None:
+            return
         await message.add_reaction(MusicEmojis.DONE)
 
     async def cog_check(self, ctx: Context[BotT]) -> bool:
@@ -342,15 +711,68 @@ class MusicCog(commands.Cog, name='Music'):
             return False
         return True
 
+    async def cog_before_invoke(self, ctx: Context[BotT]) -> None:
+        # slash invocations must be acknowledged within 3 seconds, Lavalink searches can take longer
+        if ctx.interaction is not None and not ctx.interaction.response.is_done():
+            await ctx.defer()
+        # every command runs in its own task, so this only tags this command's requests
+        request_guild.set(ctx.guild.id)
+
+    async def reply(self, ctx: Context, embed: discord.Embed):
+        # a deferred interaction has to be answered through its followup
+        if ctx.interaction is not None:
+            return await ctx.send(embed=embed)
+        return await self.sender.send(ctx.channel, embed, interactive=True)
+
+    @staticmethod
+    async def react(ctx: Context, emoji: str, reply: bool = False):
+        # slash invocations have no message to react to
+        if ctx.interaction is None:
+            await ctx.message.add_reaction(emoji)
+        elif reply:
+            await ctx.send(emoji)
+
     async def cog_load(self) -> None:
         await self.start_nodes()
+        await self.start_history()
+        self.start_audio_cache()
+
+    async def cog_unload(self) -> None:
+        if self.history is not None:
+            await self.history.close()
+        if TPlayer.audio_cache is not None:
+            await TPlayer.audio_cache.close()
+
+    @property
+    def audio_cache(self) -> AudioCache | None:
+        return TPlayer.audio_cache
+
+    @staticmethod
+    def start_audio_cache():
+        directory = os.getenv("AUDIO_CACHE_DIR")
+        if not directory:
+            return
+        TPlayer.audio_cache = AudioCache(
+            directory,
+            max_bytes=int(os.getenv("AUDIO_CACHE_MAX_MB", 1024)) * 1024 * 1024,
+            top_n=int(os.getenv("AUDIO_CACHE_TOP_N", 50)),
+            base_url=os.getenv("AUDIO_CACHE_URL")
+        )
+
+    async def start_history(self):
+        pool = getattr(self.bot, "pool", None)
+        if pool is None:
+            return
+        self.history = PlayHistory(pool)
+        self.history.start()
 
     async def start_nodes(self):
         host = os.environ['LL_HOST']
         port = os.environ['LL_PORT']
         password = os.environ['LL_PASSWORD']
         secure = bool(int(os.getenv("LL_SECURE", False)))  # number: 0 or 1
-        node = Node(uri=f'http://{host}:{port}', password=password, secure=secure)
+        node = TNode(uri=f'http://{host}:{port}', password=password, secure=secure,
+                     session=lavalink_session(password))
         await NodePool.connect(client=self.bot, nodes=[node])
 
     def get_player(self, idf: Union[Context, Guild]) -> TPlayer | None:
@@ -360,7 +782,7 @@ class MusicCog(commands.Cog, name='Music'):
         elif isinstance(idf, Guild):
             return node.get_player(idf.id)
 
-    @commands.command(name="join", aliases=["connect", 'c', 'j'])
+    @commands.hybrid_command(name="join", aliases=["connect", 'c', 'j'], description="Join your voice channel")
     async def _join(self, ctx: Context):
         vc: TPlayer = ctx.guild.voice_client
 
@@ -383,7 +805,7 @@ class MusicCog(commands.Cog, name='Music'):
             color=EMBED_COLOR
         ))
 
-    @commands.command(name="leave", aliases=['disconnect', 'd', 'l'])
+    @commands.hybrid_command(name="leave", aliases=['disconnect', 'd', 'l'], description="Leave the voice channel")
     async def _leave(self, ctx: Context):
         vc: TPlayer = ctx.voice_client
 
@@ -401,7 +823,7 @@ class MusicCog(commands.Cog, name='Music'):
                 color=EMBED_COLOR
             ), delete_after=5)
 
-    @commands.command(name="play")
+    @commands.hybrid_command(name="play", description="Play a track from a url or search")
     async def _play(self, ctx: Context, *, query: str):
         if not ctx.guild.voice_client:
             await ctx.invoke(self._join)
@@ -411,7 +833,8 @@ class MusicCog(commands.Cog, name='Music'):
         if not player:
             return
 
-        async with ctx.typing():
+        # for a slash invocation typing() defers, which cog_before_invoke already did
+        async with (ctx.typing() if ctx.interaction is None else contextlib.nullcontext()):
             tracks = await Query().parse_query(ctx, query)
             if isinstance(tracks, list):
                 for track in tracks:
@@ -423,8 +846,8 @@ class MusicCog(commands.Cog, name='Music'):
             else:
                 return
 
-            await ctx.message.add_reaction(MusicEmojis.ADDED)
-            await ctx.send(embed=discord.Embed(
+            await self.react(ctx, MusicEmojis.ADDED)
+            await self.reply(ctx, discord.Embed(
                 title="Enqueued a track!",
                 description=desc,
                 color=EMBED_COLOR
@@ -437,7 +860,7 @@ class MusicCog(commands.Cog, name='Music'):
     async def search_to_queue(self, ctx: Context, message: Message, tracks, size: int):
         def _check_reaction(rxn: Reaction, user: Member | User):
             return not (not (rxn.emoji in MusicUtils.SEARCH_OPTIONS.keys()) or not (
-                        user == ctx.message.author) or not (rxn.message.id == message.id))
+                        user == ctx.author) or not (rxn.message.id == message.id))
 
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -455,14 +878,14 @@ class MusicCog(commands.Cog, name='Music'):
             track = tracks[:size][MusicUtils.SEARCH_OPTIONS[reaction.emoji]]
             await message.clear_reactions()
             await player.queue.put_wait(await TTrack.from_track(ctx, track.data))
-            await ctx.send(embed=discord.Embed(
+            await self.reply(ctx, discord.Embed(
                 title="Enqueued a track!",
                 description=f"**[{track.title}]({track.uri})**",
                 color=EMBED_COLOR
             ))
             await player.start_player()
 
-    @commands.command(name="search", aliases=['s'])
+    @commands.hybrid_command(name="search", aliases=['s'], description="Search for tracks and pick one")
     async def _search(self, ctx: Context, *, query: str):
         source = Query.query_source(query)
         tracks = await TTrack.search_tracks(TTrack.PREFIX, query, source)
@@ -482,7 +905,7 @@ class MusicCog(commands.Cog, name='Music'):
 
         await self.bot.loop.create_task(self.search_to_queue(ctx, message, tracks, size))
 
-    @commands.command(name="history", aliases=['h'])
+    @commands.hybrid_command(name="history", aliases=['h'], description="Show the played tracks")
     async def _history(self, ctx: Context):
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -491,26 +914,22 @@ class MusicCog(commands.Cog, name='Music'):
         if player.queue.history.is_empty:
             return await ctx.send("Empty history. Play something to see it here.")
 
-        embed, pages = player.history_embed(1)
-        view = PaginationUI(pages, player.history_embed)
-        msg = await ctx.send(embed=embed, view=view)
-        view.message = msg
+        embed, _ = player.history_embed(1)
+        await ctx.send(embed=embed, view=PaginationUI.view(ctx.guild.id, "history", 1))
         return
 
-    @commands.command(name="queue", aliases=['q'])
+    @commands.hybrid_command(name="queue", aliases=['q'], description="Show the queue")
     async def _queue(self, ctx: Context):
         player: TPlayer = ctx.guild.voice_client
         if not player:
             return await ctx.send("Not connected to a VC.")
         if player.queue.is_empty:
             return await ctx.send("Empty queue!")
-        embed, pages = player.queue_embed(1)
-        view = PaginationUI(pages, player.queue_embed)
-        msg = await ctx.send(embed=embed, view=view)
-        view.message = msg
+        embed, _ = player.queue_embed(1)
+        await ctx.send(embed=embed, view=PaginationUI.view(ctx.guild.id, "queue", 1))
         return
 
-    @commands.command(name="autoqueue", aliases=['autoq', 'aq', 'aqueue'])
+    @commands.hybrid_command(name="autoqueue", aliases=['autoq', 'aq', 'aqueue'], description="Show the auto-queue")
     async def _auto_queue(self, ctx: Context):
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -519,13 +938,11 @@ class MusicCog(commands.Cog, name='Music'):
         if player.auto_queue.is_empty:
             return await ctx.send("Empty auto-queue!")
 
-        embed, pages = player.auto_queue_embed(1)
-        view = PaginationUI(pages, player.auto_queue_embed)
-        msg = await ctx.send(embed=embed, view=view)
-        view.message = msg
+        embed, _ = player.auto_queue_embed(1)
+        await ctx.send(embed=embed, view=PaginationUI.view(ctx.guild.id, "autoqueue", 1))
         return
 
-    @commands.command(name="populate", aliases=['eaq', 'enableautoqueue'])
+    @commands.hybrid_command(name="populate", aliases=['eaq', 'enableautoqueue'], description="Toggle the auto-queue")
     async def _populate(self, ctx: Context):
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -538,7 +955,7 @@ class MusicCog(commands.Cog, name='Music'):
             color=EMBED_COLOR
         ))
 
-    @commands.command(name="skip", aliases=['next', 'n'])
+    @commands.hybrid_command(name="skip", aliases=['next', 'n'], description="Skip the current track")
     async def _skip(self, ctx: Context):
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -546,11 +963,11 @@ class MusicCog(commands.Cog, name='Music'):
         if not player.is_playing():
             return await ctx.send("Not playing anything at the moment.")
 
-        track: TTrack = player.current
-        await player.seek(track.duration + 1)
-        await ctx.message.add_reaction(MusicEmojis.SKIP)
+        self.record_event(player, "skip", player.current, player.position)
+        await player.skip()
+        await self.react(ctx, MusicEmojis.SKIP, reply=True)
 
-    @commands.command(name="volume", aliases=['vol', 'v'])
+    @commands.hybrid_command(name="volume", aliases=['vol', 'v'], description="Show or set the player volume")
     async def _volume(self, ctx: Context, value: int = None):
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -579,7 +996,7 @@ class MusicCog(commands.Cog, name='Music'):
             color=EMBED_COLOR
         ))
 
-    @commands.command(name="pause")
+    @commands.hybrid_command(name="pause", description="Pause the player")
     async def _pause(self, ctx: Context):
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -589,13 +1006,13 @@ class MusicCog(commands.Cog, name='Music'):
             return await ctx.send("Not playing anything at the moment.")
         else:
             await player.pause()
-            await ctx.message.add_reaction(MusicEmojis.PAUSE)
+            await self.react(ctx, MusicEmojis.PAUSE)
             return await ctx.send(embed=discord.Embed(
                 title="Paused",
                 color=EMBED_COLOR
             ))
 
-    @commands.command(name="resume")
+    @commands.hybrid_command(name="resume", description="Resume the player")
     async def _resume(self, ctx: Context):
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -605,14 +1022,14 @@ class MusicCog(commands.Cog, name='Music'):
             return await ctx.send("Not playing anything at the moment.")
         if player.is_playing():
             return await ctx.send("Player isn't paused!")
-        await ctx.message.add_reaction(MusicEmojis.PLAY)
+        await self.react(ctx, MusicEmojis.PLAY)
         await player.resume()
         return await ctx.send(embed=discord.Embed(
             title="Resumed",
             color=EMBED_COLOR
         ))
 
-    @commands.command(name="seek")
+    @commands.hybrid_command(name="seek", description="Seek to a position in seconds")
     async def _seek(self, ctx: Context, position: int = None):
         if position is None:
             return await ctx.send("Player position is required!")
@@ -635,7 +1052,7 @@ class MusicCog(commands.Cog, name='Music'):
             color=EMBED_COLOR
         ))
 
-    @commands.command(name="nowplaying", aliases=['np', 'current'])
+    @commands.hybrid_command(name="nowplaying", aliases=['np', 'current'], description="Show the current track")
     async def _now_playing(self, ctx: Context):
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -646,13 +1063,9 @@ class MusicCog(commands.Cog, name='Music'):
 
         current: TTrack = player.current
         played = int(player.position / 1000)
-        embed = current.track_embed()
-        embed.insert_field_at(index=1, name="Played", value=TTrack.parse_duration(played), inline=False)
-        progress_bar = progressBar.splitBar(int(current.duration / 1000), played, size=12)[0]
-        embed.insert_field_at(index=2, name="", value=progress_bar, inline=False)
-        return await ctx.send(embed=embed)
+        return await ctx.send(embed=current.now_playing_embed(played))
 
-    @commands.command(name="shuffle")
+    @commands.hybrid_command(name="shuffle", description="Shuffle the queue")
     async def _shuffle(self, ctx: Context):
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -666,7 +1079,7 @@ class MusicCog(commands.Cog, name='Music'):
             color=EMBED_COLOR
         ))
 
-    @commands.command(name="loops", aliases=['ls'])
+    @commands.hybrid_command(name="loops", aliases=['ls'], description="Toggle looping the current track")
     async def _loop_single(self, ctx: Context):
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -692,7 +1105,7 @@ class MusicCog(commands.Cog, name='Music'):
                 color=EMBED_COLOR
             ))
 
-    @commands.command(name="loopq", aliases=['lq', 'loopall', 'la'])
+    @commands.hybrid_command(name="loopq", aliases=['lq', 'loopall', 'la'], description="Toggle looping the queue")
     async def _loop_all(self, ctx: Context):
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -716,7 +1129,7 @@ class MusicCog(commands.Cog, name='Music'):
                 color=EMBED_COLOR
             ))
 
-    @commands.command(name="clear")
+    @commands.hybrid_command(name="clear", description="Clear the queue")
     async def _clear(self, ctx: Context):
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -731,7 +1144,7 @@ class MusicCog(commands.Cog, name='Music'):
             color=EMBED_COLOR
         ))
 
-    @commands.command(name="remove", aliases=['rm'])
+    @commands.hybrid_command(name="remove", aliases=['rm'], description="Remove a track from the queue")
     async def _remove(self, ctx: Context, index: int = None):
         if index is None:
             return await ctx.send("Track's index is needed.")
@@ -757,7 +1170,7 @@ class MusicCog(commands.Cog, name='Music'):
             color=EMBED_COLOR
         ))
 
-    @commands.command(name="playerstatus", aliases=['ps'])
+    @commands.hybrid_command(name="playerstatus", aliases=['ps'], description="Show the player status")
     async def _player_status(self, ctx: Context):
         player: TPlayer = ctx.guild.voice_client
         if not player:
@@ -788,6 +1201,46 @@ class MusicCog(commands.Cog, name='Music'):
             embed.insert_field_at(0, name="Current", value=f"[{current.title}]({current.uri})", inline=False)
         return await ctx.send(embed=embed)
 
+    @commands.hybrid_command(name="top", description="Show the most played tracks")
+    async def _top(self, ctx: Context, limit: int = 10):
+        if self.history is None:
+            return await ctx.send("Play history is not enabled.")
+
+        tracks = await self.history.top_tracks(ctx.guild.id, max(1, min(limit, 25)))
+        if not tracks:
+            return await ctx.send("Nothing played yet.")
+
+        _tracks = ''
+        for i, track in enumerate(tracks, start=1):
+            _tracks += f"`{i}.` **[{track['title']}]({track['uri']})** - `{track['plays']}` plays" + "\n"
+        return await ctx.send(embed=discord.Embed(
+            title="Top tracks",
+            description=_tracks,
+            color=EMBED_COLOR
+        ))
+
+    @commands.hybrid_command(name="stats", description="Show the play stats of this server")
+    async def _stats(self, ctx: Context):
+        if self.history is None:
+            return await ctx.send("Play history is not enabled.")
+
+        stats = await self.history.stats(ctx.guild.id)
+        if stats is None:
+            return await ctx.send("Nothing played yet.")
+
+        listened = TTrack.parse_duration(stats['ms_played'] / 1000) or "0 seconds"
+        embed = (discord.Embed(
+            title="Play Stats",
+            color=EMBED_COLOR
+        )
+                 .add_field(name="Played", value=stats['starts'])
+                 .add_field(name="Completed", value=stats['completes'])
+                 .add_field(name="Skipped", value=stats['skips'])
+                 .add_field(name="Unique tracks", value=stats['tracks'])
+                 .add_field(name="Listened", value=listened, inline=False)
+                 .add_field(name="Since", value=f"<t:{int(stats['first_played'].timestamp())}:D>"))
+        return await ctx.send(embed=embed)
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(MusicCog(bot))
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import discord
+from discord.ext import commands
+from discord.ext.commands import Context
+from discord.ext.commands._types import BotT
+from ..utils import lavalink_scheduler
+
+EMBED_COLOR = discord.Color.dark_grey()
+
+
+class OwnerCog(commands.Cog, name='Owner'):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    async def cog_check(self, ctx: Context[BotT]) -> bool:
+        if not await self.bot.is_owner(ctx.author):
+            raise commands.NotOwner("You do not own this bot.")
+        return True
+
+    @commands.command(name="requests", aliases=['rq'])
+    async def _requests(self, ctx: Context):
+        embed = discord.Embed(title="Lavalink requests", color=EMBED_COLOR)
+        for node_id, stats in lavalink_scheduler.stats().items():
+            lines = [
+                f"Limit `{stats['limit']}`, in flight `{stats['in_flight']}`",
+                f"Requests `{stats['requests']}`, errors `{stats['errors']}`"
+            ]
+            for priority, queued in stats["queued"].items():
+                lines.append(f"**{priority}**: queued `{queued}`, "
+                             f"wait avg `{stats['wait_avg'][priority] * 1000:.1f} ms`, "
+                             f"max `{stats['wait_max'][priority] * 1000:.1f} ms`")
+            embed.add_field(name=node_id, value="\n".join(lines), inline=False)
+        return await ctx.send(embed=embed)
+
+    @commands.command(name="audiocache", aliases=['ac'])
+    async def _audio_cache(self, ctx: Context):
+        cache = getattr(self.bot.get_cog("Music"), "audio_cache", None)
+        if cache is None:
+            return await ctx.send("Audio cache is not enabled.")
+
+        stats = cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        embed = (discord.Embed(
+            title="Audio cache",
+            color=EMBED_COLOR
+        )
+                 .add_field(name="Files", value=stats["files"])
+                 .add_field(name="Size", value=f"{stats['size'] / 1024 ** 2:.1f} MiB")
+                 .add_field(name="Hit rate", value=f"{stats['hits'] / max(lookups, 1) * 100:.1f}% of {lookups}")
+                 .add_field(name="Saved", value=f"{stats['bytes_saved'] / 1024 ** 2:.1f} MiB")
+                 .add_field(name="Fetched", value=stats["fetched"])
+                 .add_field(name="Evicted", value=stats["evicted"]))
+        return await ctx.send(embed=embed)
+
+    @commands.command(name="playhistory", aliases=['ph'])
+    async def _play_history(self, ctx: Context):
+        history = getattr(self.bot.get_cog("Music"), "history", None)
+        if history is None:
+            return await ctx.send("Play history is not enabled.")
+
+        counters = history.counters()
+        embed = (discord.Embed(
+            title="Play history",
+            color=EMBED_COLOR
+        )
+                 .add_field(name="Buffered", value=f"{counters['buffered']}/{history.max_size}")
+                 .add_field(name="Written", value=counters["written"])
+                 .add_field(name="Dropped", value=counters["dropped"]))
+        return await ctx.send(embed=embed)
+
+    @commands.command(name="health")
+    async def _health(self, ctx: Context, guild_id: int = None):
+        health = getattr(self.bot.get_cog("Music"), "health", None)
+        if health is None:
+            return await ctx.send("Music cog is not loaded.")
+
+        embed = discord.Embed(title="Playback health", color=EMBED_COLOR)
+        for node_id, samples in health.nodes.items():
+            last = samples[-1]
+            embed.add_field(
+                name=f"{node_id} ({health.node_state(node_id)})",
+                value=f"Lost `{health.frame_loss(node_id) * 100:.2f}%`, "
+                      f"sent `{last['sent']}` nulled `{last['nulled']}` deficit `{last['deficit']}`\n"
+                      f"Playing `{last['playing']}/{last['players']}`, load `{last['load'] * 100:.1f}%`",
+                inline=False
+            )
+
+        guild_id = guild_id or ctx.guild.id
+        updates = list(health.players.get(guild_id, []))[-10:]
+        if updates:
+            embed.add_field(
+                name=f"Player {guild_id}",
+                value="\n".join(f"<t:{int(u['time'])}:T> `{u['node']}` ping `{u['ping']} ms` drift `{u['drift']} ms`"
+                                for u in updates),
+                inline=False
+            )
+        events = [e for e in health.events if e["guild"] == guild_id][-10:]
+        if events:
+            embed.add_field(
+                name="Events",
+                value="\n".join(f"<t:{int(e['time'])}:T> **{e['kind']}** {e['detail']}" for e in events),
+                inline=False
+            )
+        return await ctx.send(embed=embed)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(OwnerCog(bot))
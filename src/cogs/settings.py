@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import discord
+from discord.ext import commands
+from discord.ext.commands import Context
+from discord.ext.commands._types import BotT
+from discord import DMChannel
+
+EMBED_COLOR = discord.Color.magenta()
+
+
+class SettingsCog(commands.Cog, name='Settings'):
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    async def cog_check(self, ctx: Context[BotT]) -> bool:
+        if isinstance(ctx.channel, DMChannel):
+            await ctx.send("Settings are not supported in DMs.")
+            return False
+        return True
+
+    @commands.command(name="prefix")
+    async def _prefix(self, ctx: Context, prefix: str = None):
+        if prefix is None:
+            return await ctx.send(embed=discord.Embed(
+                title="Prefix",
+                description=f"**`{self.bot.prefixes.get(ctx.guild.id)}`**",
+                color=EMBED_COLOR
+            ))
+
+        if not ctx.author.guild_permissions.manage_guild:
+            return await ctx.send("You need the `Manage Server` permission to change the prefix.")
+        if not self.bot.prefixes.persistent:
+            return await ctx.send("Prefixes can't be changed, the database is not configured.")
+        if len(prefix) > 5:
+            return await ctx.send("Prefix can be at most 5 characters long.")
+
+        if prefix == self.bot.prefixes.default:
+            await self.bot.prefixes.reset(ctx.guild.id)
+        else:
+            await self.bot.prefixes.set(ctx.guild.id, prefix)
+        return await ctx.send(embed=discord.Embed(
+            title="Prefix changed",
+            description=f"**`{prefix}`**",
+            color=EMBED_COLOR
+        ))
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(SettingsCog(bot))
@@ -0,0 +1,103 @@
+CREATE_DB = "CREATE DATABASE {dbname}"
+
+CREATE_PLAYLISTS = """
+CREATE TABLE IF NOT EXISTS playlists (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    name TEXT NOT NULL,
+    tracks TEXT[] NOT NULL DEFAULT '{}',
+    UNIQUE (user_id, name)
+)
+"""
+
+CREATE_GUILD_PREFIXES = """
+CREATE TABLE IF NOT EXISTS guild_prefixes (
+    guild_id BIGINT PRIMARY KEY,
+    prefix TEXT NOT NULL
+)
+"""
+SELECT_PREFIXES = "SELECT guild_id, prefix FROM guild_prefixes"
+UPSERT_PREFIX = """
+INSERT INTO guild_prefixes (guild_id, prefix) VALUES ($1, $2)
+ON CONFLICT (guild_id) DO UPDATE SET prefix = EXCLUDED.prefix
+"""
+DELETE_PREFIX = "DELETE FROM guild_prefixes WHERE guild_id = $1"
+
+# raw, append-only events written with COPY
+CREATE_PLAY_EVENTS = """
+CREATE TABLE IF NOT EXISTS play_events (
+    guild_id BIGINT NOT NULL,
+    event TEXT NOT NULL,
+    reason TEXT,
+    identifier TEXT NOT NULL,
+    title TEXT NOT NULL,
+    uri TEXT,
+    requester_id BIGINT,
+    position_ms BIGINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL
+)
+"""
+PLAY_EVENTS_COLUMNS = (
+    "guild_id", "event", "reason", "identifier", "title", "uri", "requester_id", "position_ms", "created_at"
+)
+
+# rollups, updated per flushed batch so the commands never scan play_events
+CREATE_ROLLUPS = """
+CREATE TABLE IF NOT EXISTS guild_track_plays (
+    guild_id BIGINT NOT NULL,
+    identifier TEXT NOT NULL,
+    title TEXT NOT NULL,
+    uri TEXT,
+    plays INTEGER NOT NULL DEFAULT 0,
+    skips INTEGER NOT NULL DEFAULT 0,
+    last_played TIMESTAMPTZ,
+    PRIMARY KEY (guild_id, identifier)
+);
+CREATE INDEX IF NOT EXISTS guild_track_plays_top ON guild_track_plays (guild_id, plays DESC);
+CREATE TABLE IF NOT EXISTS guild_play_stats (
+    guild_id BIGINT PRIMARY KEY,
+    starts INTEGER NOT NULL DEFAULT 0,
+    completes INTEGER NOT NULL DEFAULT 0,
+    skips INTEGER NOT NULL DEFAULT 0,
+    ms_played BIGINT NOT NULL DEFAULT 0,
+    first_played TIMESTAMPTZ,
+    last_played TIMESTAMPTZ
+)
+"""
+
+UPSERT_TRACK_PLAYS = """
+INSERT INTO guild_track_plays (guild_id, identifier, title, uri, plays, skips, last_played)
+VALUES ($1, $2, $3, $4, $5, $6, $7)
+ON CONFLICT (guild_id, identifier) DO UPDATE SET
+    title = EXCLUDED.title,
+    uri = EXCLUDED.uri,
+    plays = guild_track_plays.plays + EXCLUDED.plays,
+    skips = guild_track_plays.skips + EXCLUDED.skips,
+    last_played = GREATEST(guild_track_plays.last_played, EXCLUDED.last_played)
+"""
+
+UPSERT_PLAY_STATS = """
+INSERT INTO guild_play_stats (guild_id, starts, completes, skips, ms_played, first_played, last_played)
+VALUES ($1, $2, $3, $4, $5, $6, $7)
+ON CONFLICT (guild_id) DO UPDATE SET
+    starts = guild_play_stats.starts + EXCLUDED.starts,
+    completes = guild_play_stats.completes + EXCLUDED.completes,
+    skips = guild_play_stats.skips + EXCLUDED.skips,
+    ms_played = guild_play_stats.ms_played + EXCLUDED.ms_played,
+    first_played = LEAST(guild_play_stats.first_played, EXCLUDED.first_played),
+    last_played = GREATEST(guild_play_stats.last_played, EXCLUDED.last_played)
+"""
+
+SELECT_TOP_TRACKS = """
+SELECT identifier, title, uri, plays, skips FROM guild_track_plays
+WHERE guild_id = $1
+ORDER BY plays DESC, last_played DESC
+LIMIT $2
+"""
+
+SELECT_PLAY_STATS = """
+SELECT starts, completes, skips, ms_played, first_played, last_played,
+       (SELECT COUNT(*) FROM guild_track_plays WHERE guild_id = $1) AS tracks
+FROM guild_play_stats
+WHERE guild_id = $1
+"""
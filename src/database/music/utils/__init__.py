@@ -1 +1,2 @@
 from .connection_pool import create_pool
+from .play_history import PlayHistory
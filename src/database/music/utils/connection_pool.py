@@ -19,4 +19,13 @@ async def create_pool(dsn, dbname: str):
         await connection.execute(
             sql.CREATE_PLAYLISTS
         )
+        await connection.execute(
+            sql.CREATE_GUILD_PREFIXES
+        )
+        await connection.execute(
+            sql.CREATE_PLAY_EVENTS
+        )
+        await connection.execute(
+            sql.CREATE_ROLLUPS
+        )
     return pool
@@ -0,0 +1,135 @@
+import asyncio
+from collections import deque
+from datetime import datetime, timezone
+from logging import getLogger
+
+import asyncpg
+from .. import sql
+
+logger = getLogger("discord")
+
+
+class PlayHistory:
+    """Write-behind buffer of track events, flushed to Postgres with COPY on a size / time trigger.
+
+    `record` never waits on the database: when the buffer is full new events are dropped and counted.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, max_size: int = 10_000, batch_size: int = 500, interval: float = 5.0):
+        self.pool = pool
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.written = 0
+        self.dropped = 0
+        self._dropping = False
+        self._buffer: deque[tuple] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._buffer:
+            if not await self.flush():
+                break
+
+    def record(self, guild_id: int, event: str, identifier: str, title: str, uri: str | None,
+               requester_id: int | None = None, position_ms: int = 0, reason: str | None = None):
+        if len(self._buffer) >= self.max_size:
+            self._drop(1)
+            return
+        self._buffer.append((guild_id, event, reason, identifier, title, uri, requester_id,
+                             int(position_ms), datetime.now(timezone.utc)))
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._buffer:
+                if not await self.flush():
+                    # database is behind, let the buffer absorb it (and drop) until the next tick
+                    break
+                if len(self._buffer) < self.batch_size:
+                    break
+
+    async def flush(self) -> bool:
+        batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+        if not batch:
+            return True
+        try:
+            async with self.pool.acquire() as connection:
+                async with connection.transaction():
+                    await connection.copy_records_to_table(
+                        "play_events", records=batch, columns=sql.PLAY_EVENTS_COLUMNS
+                    )
+                    tracks, stats = self.rollup(batch)
+                    await connection.executemany(sql.UPSERT_TRACK_PLAYS, tracks)
+                    await connection.executemany(sql.UPSERT_PLAY_STATS, stats)
+        except asyncio.CancelledError:
+            self._buffer.extendleft(reversed(batch))
+            raise
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} play events: {e}")
+            # put the batch back in front if there is room, newest events are lost first
+            room = self.max_size - len(self._buffer)
+            if len(batch) > room:
+                self._drop(len(batch) - room)
+            self._buffer.extendleft(reversed(batch[:room]))
+            return False
+        self.written += len(batch)
+        if self._dropping:
+            self._dropping = False
+            logger.info(f"Play history writes caught up, {self.dropped} events dropped so far.")
+        return True
+
+    def _drop(self, count: int):
+        self.dropped += count
+        if not self._dropping:
+            self._dropping = True
+            logger.warning(f"Play history buffer is full ({self.max_size} events), "
+                           f"dropping new events until the database catches up.")
+
+    def counters(self) -> dict[str, int]:
+        return {"buffered": len(self._buffer), "written": self.written, "dropped": self.dropped}
+
+    @staticmethod
+    def rollup(batch: list[tuple]) -> tuple[list[tuple], list[tuple]]:
+        tracks: dict[tuple[int, str], list] = {}
+        stats: dict[int, list] = {}
+        for guild_id, event, reason, identifier, title, uri, _, position_ms, created_at in batch:
+            track = tracks.setdefault((guild_id, identifier), [guild_id, identifier, title, uri, 0, 0, created_at])
+            guild = stats.setdefault(guild_id, [guild_id, 0, 0, 0, 0, created_at, created_at])
+            track[6] = max(track[6], created_at)
+            guild[6] = max(guild[6], created_at)
+            if event == "start":
+                track[4] += 1
+                guild[1] += 1
+            elif event == "skip":
+                track[5] += 1
+                guild[3] += 1
+                guild[4] += position_ms
+            elif event == "end" and reason == "FINISHED":
+                guild[2] += 1
+                guild[4] += position_ms
+        return [tuple(t) for t in tracks.values()], [tuple(s) for s in stats.values()]
+
+    async def top_tracks(self, guild_id: int, limit: int = 10) -> list[asyncpg.Record]:
+        return await self.pool.fetch(sql.SELECT_TOP_TRACKS, guild_id, limit)
+
+    async def stats(self, guild_id: int) -> asyncpg.Record | None:
+        return await self.pool.fetchrow(sql.SELECT_PLAY_STATS, guild_id)
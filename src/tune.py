@@ -1,11 +1,17 @@
 import os
+import time
 import asyncio
 from pathlib import Path
+from logging import getLogger
 
+import asyncpg
 import discord
 from discord import Message
 from discord.ext import commands
-from .utils import clear_print
+from .utils import clear_print, LoopMonitor, PrefixCache, install_fast_runtime, sync_commands
+from .database.music.utils import create_pool
+
+logger = getLogger("discord")
 
 
 class Tune(commands.Bot):
@@ -16,11 +22,32 @@ class Tune(commands.Bot):
             case_insensitive=False,
             intents=discord.Intents.all()
         )
+        self.pool: asyncpg.Pool | None = None
+        self.prefixes = PrefixCache()
+        self.monitor: LoopMonitor | None = None
+        if bool(int(os.getenv("MONITOR", 0))):  # number: 0 or 1
+            self.monitor = LoopMonitor(slow_threshold=int(os.getenv("MONITOR_SLOW_MS", 250)) / 1000)
 
     # https://gist.github.com/Rapptz/6706e1c8f23ac27c98cee4dd985c8120#breaking-changes
     async def setup_hook(self) -> None:
+        if self.monitor is not None:
+            self.monitor.start()
+        dsn = os.getenv("DB_DSN")
+        if dsn:
+            await self.setup_database(dsn)
         self.loop.create_task(self.setup())
 
+    async def setup_database(self, dsn: str):
+        # play history and custom prefixes are optional, music must still start without the database
+        try:
+            self.pool = await create_pool(dsn, os.getenv("DB_NAME", "tune"))
+            await self.prefixes.load(self.pool)
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+            logger.error(f"Database unavailable, play history and custom prefixes are disabled: {e}")
+            if self.pool is not None:
+                await self.pool.close()
+                self.pool = None
+
     async def setup(self):
         clear_print("Loading extensions...")
         val = 0
@@ -31,15 +58,36 @@ class Tune(commands.Bot):
             await asyncio.sleep(2)
             clear_print(f"Loading ext: {cog}... {(val / cogs) * 100:.2f}%")
         clear_print("Loaded extensions!")
+        # test guilds get their commands instantly, global ones can take a while to show up
+        guilds = [int(g) for g in os.getenv("TEST_GUILDS", "").split(",") if g.strip()]
+        synced = await sync_commands(self, guilds)
+        clear_print(f"Synced app commands: {', '.join(synced)}" if synced else "App commands up to date!")
 
     def tune(self):
         TOKEN = os.environ['TOKEN']
+        if bool(int(os.getenv("FAST_RUNTIME", 0))):  # number: 0 or 1
+            runtime = install_fast_runtime()
+            print(f"Using {runtime['loop']} + {runtime['json']}")
         print("Starting Tune...")
         self.run(TOKEN, log_handler=None)
 
     async def shutdown(self):
         clear_print("Shutting down!")
+        if self.monitor is not None:
+            self.monitor.stop()
         await self.close()
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        if self.monitor is None:
+            return await super()._run_event(coro, event_name, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            await super()._run_event(coro, event_name, *args, **kwargs)
+        finally:
+            owner = getattr(getattr(coro, "__self__", None), "qualified_name", type(self).__name__)
+            self.monitor.record_listener(f"{owner}.{event_name}", time.perf_counter() - start)
 
     async def on_connect(self):
         clear_print(f"Connected to Discord -> {self.latency * 1000:.2f} ms")
@@ -57,6 +105,15 @@ class Tune(commands.Bot):
         )
         clear_print("Bot is ready!")
 
+    async def on_message(self, message: Message, /):
+        # nearly every message isn't a command, reject those before building a context
+        if message.author.bot:
+            return
+        guild_id = message.guild.id if message.guild else 0
+        if not message.content.startswith(self.prefixes.matcher(guild_id, self.user.id)):
+            return
+        await self.process_commands(message)
+
     async def get_prefix(self, content: Message, /):
-        # other prefixes
-        return commands.when_mentioned_or("'")(self, content)
+        guild_id = content.guild.id if content.guild else 0
+        return list(self.prefixes.matcher(guild_id, self.user.id))
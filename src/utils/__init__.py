@@ -1,3 +1,11 @@
 from .clear_print import clear_print
 from .logger import discord_logger
 from .paginator import paginate_items
+from .monitor import LoopMonitor
+from .runtime import install_fast_runtime, lavalink_session
+from .sender import ChannelSender
+from .scheduler import Priority, RequestScheduler, lavalink_scheduler, request_context, request_guild
+from .prefix import PrefixCache, DEFAULT_PREFIX
+from .command_sync import sync_commands
+from .audio_cache import AudioCache
+from .playback_health import PlaybackHealth
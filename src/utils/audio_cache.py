@@ -0,0 +1,203 @@
+import os
+import asyncio
+import hashlib
+from collections import Counter, OrderedDict
+from logging import getLogger
+
+import aiohttp
+
+logger = getLogger("discord")
+
+try:
+    import yt_dlp
+except ImportError:
+    yt_dlp = None
+
+
+class AudioCache:
+    """Keeps the `top_n` most played tracks on disk, evicting the least recently played ones past `max_bytes`.
+
+    Cached files are handed to Lavalink either as local paths (`local` source) or, with `base_url`,
+    as urls of a static server over the cache directory (`http` source).
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, directory: str, max_bytes: int, top_n: int = 50, min_plays: int = 3,
+                 base_url: str | None = None, max_tracked: int = 5000):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.top_n = top_n
+        self.min_plays = min_plays
+        self.max_tracked = max(max_tracked, top_n * 2)
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.plays = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.fetched = 0
+        self.evicted = 0
+        self._files: OrderedDict[str, tuple[str, int]] = OrderedDict()  # key -> (path, size), LRU first
+        self._size = 0
+        self._fetching: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._session: aiohttp.ClientSession | None = None
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._scan()
+        if yt_dlp is None:
+            logger.warning("yt-dlp is not installed, the audio cache will only keep direct http tracks.")
+
+    @staticmethod
+    def key(identifier: str) -> str:
+        return hashlib.sha1(identifier.encode()).hexdigest()
+
+    def _scan(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".part"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, entry.path, stat.st_size))
+        for _, name, path, size in sorted(entries):
+            self._files[name.split(".")[0]] = (path, size)
+            self._size += size
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def source(self, identifier: str) -> str | None:
+        """Returns what Lavalink should load for the track, or None on a miss.
+
+        A returned source only counts as a hit once it loaded, see `record_hit` / `record_miss`.
+        """
+        entry = self._files.get(self.key(identifier))
+        if entry is None:
+            self.misses += 1
+            return None
+        path, _ = entry
+        if self.base_url:
+            return f"{self.base_url}/{os.path.basename(path)}"
+        return path
+
+    async def record_hit(self, identifier: str):
+        key = self.key(identifier)
+        entry = self._files.get(key)
+        if entry is None:
+            return
+        path, size = entry
+        self._files.move_to_end(key)
+        self.hits += 1
+        self.bytes_saved += size
+        try:
+            await asyncio.to_thread(os.utime, path)  # keeps the LRU order across restarts
+        except FileNotFoundError:
+            pass
+
+    def record_miss(self):
+        # the cached file was found but Lavalink couldn't load it
+        self.misses += 1
+
+    def record_play(self, identifier: str, uri: str):
+        self.plays[identifier] += 1
+        if len(self.plays) > self.max_tracked:
+            # only the most played half is kept, most_common below stays bounded
+            self.plays = Counter(dict(self.plays.most_common(self.max_tracked // 2)))
+        key = self.key(identifier)
+        if key in self._files or key in self._fetching or self.plays[identifier] < self.min_plays:
+            return
+        if identifier not in dict(self.plays.most_common(self.top_n)):
+            return
+        self._fetching.add(key)
+        task = asyncio.create_task(self._fetch(key, uri))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def resolve(uri: str) -> str | None:
+        if "youtube" in uri or "youtu.be" in uri or "soundcloud" in uri:
+            if yt_dlp is None:
+                return None
+
+            def extract():
+                with yt_dlp.YoutubeDL({"format": "bestaudio", "quiet": True, "noplaylist": True}) as ydl:
+                    return ydl.extract_info(uri, download=False).get("url")
+            return await asyncio.to_thread(extract)
+        # direct audio urls (http source)
+        return uri
+
+    async def _fetch(self, key: str, uri: str):
+        path = os.path.join(self.directory, key)
+        try:
+            url = await self.resolve(uri)
+            if url is None:
+                logger.debug(f"Audio cache can't fetch {uri}, yt-dlp is not installed.")
+                return
+
+            if self._session is None:
+                self._session = aiohttp.ClientSession()
+            size = 0
+            # a single track may use at most a quarter of the cache
+            limit = self.max_bytes // 4
+            async with self._session.get(url) as resp:
+                if resp.status != 200:
+                    logger.warning(f"Audio cache fetch failed for {uri}: HTTP {resp.status}")
+                    return
+                # file I/O runs in a thread, a track can be tens of megabytes
+                f = await asyncio.to_thread(open, path + ".part", "wb")
+                try:
+                    async for chunk in resp.content.iter_chunked(self.CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > limit:
+                            logger.info(f"Audio cache skipped {uri}: larger than {limit} bytes")
+                            return
+                        await asyncio.to_thread(f.write, chunk)
+                finally:
+                    await asyncio.to_thread(f.close)
+            await asyncio.to_thread(os.replace, path + ".part", path)
+        except Exception as e:
+            logger.warning(f"Audio cache fetch failed for {uri}: {e}")
+        else:
+            self._files[key] = (path, size)
+            self._size += size
+            self.fetched += 1
+            await self._evict()
+        finally:
+            self._fetching.discard(key)
+            await asyncio.to_thread(self._remove, path + ".part")
+
+    @staticmethod
+    def _remove(*paths: str):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def _evict(self):
+        evicted = []
+        while self._size > self.max_bytes and self._files:
+            _, (path, size) = self._files.popitem(last=False)
+            self._size -= size
+            self.evicted += 1
+            evicted.append(path)
+        if evicted:
+            await asyncio.to_thread(self._remove, *evicted)
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        # the fetches still use the session while they unwind
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "files": len(self._files),
+            "size": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes_saved": self.bytes_saved,
+            "fetched": self.fetched,
+            "evicted": self.evicted
+        }
@@ -0,0 +1,57 @@
+import os
+import json
+import hashlib
+from logging import getLogger
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+logger = getLogger("discord")
+
+
+def tree_hash(tree: app_commands.CommandTree, guild: discord.abc.Snowflake | None = None) -> str:
+    payload = sorted((cmd.to_dict() for cmd in tree.get_commands(guild=guild)), key=lambda c: c["name"])
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _load_hashes(path: str) -> dict[str, str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_hashes(path: str, hashes: dict[str, str]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(hashes, f, indent=2)
+
+
+async def sync_commands(bot: commands.Bot, guild_ids: list[int] | None = None) -> list[str]:
+    """Syncs the app command tree only when its hash differs from the last synced one.
+
+    With `guild_ids` (test guilds) the global commands are copied to and synced per guild instead.
+    Returns the keys that were synced.
+    """
+    path = os.getenv("COMMAND_HASH_PATH", ".command_hashes.json")
+    hashes = _load_hashes(path)
+    synced = []
+
+    targets: list[discord.Object | None] = [discord.Object(id=g) for g in guild_ids] if guild_ids else [None]
+    try:
+        for guild in targets:
+            if guild is not None:
+                bot.tree.copy_global_to(guild=guild)
+            key = f"{bot.application_id}:{guild.id if guild else 'global'}"
+            digest = tree_hash(bot.tree, guild)
+            if hashes.get(key) == digest:
+                continue
+            await bot.tree.sync(guild=guild)
+            hashes[key] = digest
+            synced.append(key)
+            logger.info(f"Synced app commands for {key}")
+    finally:
+        if synced:
+            _save_hashes(path, hashes)
+    return synced
@@ -0,0 +1,112 @@
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from collections import Counter, defaultdict, deque
+from logging import getLogger
+
+logger = getLogger("discord")
+
+
+class LoopMonitor:
+    """Samples event loop lag and captures the stack of callbacks that block the loop."""
+
+    def __init__(self, interval: float = 0.5, slow_threshold: float = 0.25, history: int = 240):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.lags: deque[float] = deque(maxlen=history)
+        self.slow_stacks: deque[tuple[float, float, str]] = deque(maxlen=10)
+        self.listeners: dict[str, list[float]] = defaultdict(lambda: [0, 0.0, 0.0])  # calls, total, max
+        self._beat = time.perf_counter()
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._running = False
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._loop_thread = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._task = asyncio.create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._beat = now
+            self.lags.append(max(now - start - self.interval, 0.0))
+
+    def _watch(self):
+        # runs in its own thread, so it still sees the loop while a callback blocks it
+        captured = False
+        while self._running:
+            time.sleep(self.slow_threshold / 2)
+            blocked = time.perf_counter() - self._beat - self.interval
+            if blocked < self.slow_threshold:
+                captured = False
+                continue
+            if captured:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            self.slow_stacks.append((time.time(), blocked, stack))
+            logger.warning(f"Event loop blocked for {blocked * 1000:.0f} ms:\n{stack}")
+            captured = True
+
+    def lag_stats(self) -> dict[str, float]:
+        if not self.lags:
+            return {"samples": 0, "avg": 0.0, "p95": 0.0, "max": 0.0}
+        lags = sorted(self.lags)
+        return {
+            "samples": len(lags),
+            "avg": sum(lags) / len(lags),
+            "p95": lags[min(int(len(lags) * 0.95), len(lags) - 1)],
+            "max": lags[-1]
+        }
+
+    def record_listener(self, name: str, elapsed: float):
+        stats = self.listeners[name]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+
+    @staticmethod
+    def task_counts() -> Counter:
+        counts = Counter()
+        for task in asyncio.all_tasks():
+            coro = task.get_coro()
+            counts[getattr(coro, "__qualname__", type(coro).__name__)] += 1
+        return counts
+
+    def profile(self, seconds: float, path: str, rate: float = 0.005) -> int:
+        """Samples the loop thread for `seconds` and writes folded stacks to `path`.
+
+        Blocking, call it through `asyncio.to_thread`.
+        """
+        stacks = Counter()
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                stack = traceback.extract_stack(frame)
+                stacks[";".join(f"{f.name} ({f.filename}:{f.lineno})" for f in stack)] += 1
+            time.sleep(rate)
+
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return sum(stacks.values())
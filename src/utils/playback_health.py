@@ -0,0 +1,79 @@
+import time
+from collections import defaultdict, deque
+
+OK = "ok"
+DEGRADED = "degraded"
+CRITICAL = "critical"
+
+
+class PlaybackHealth:
+    """Frame stats per node (from Lavalink stats) and position drift per player (from player updates).
+
+    A node is degraded / critical when the share of nulled + missing frames over its last `window`
+    stats crosses `degraded` / `critical`.
+    """
+
+    def __init__(self, degraded: float = 0.02, critical: float = 0.10, window: int = 3, history: int = 720):
+        self.degraded = degraded
+        self.critical = critical
+        self.window = window
+        self.nodes: dict[str, deque[dict]] = defaultdict(lambda: deque(maxlen=history))
+        self.players: dict[int, deque[dict]] = defaultdict(lambda: deque(maxlen=history))
+        self.events: deque[dict] = deque(maxlen=200)
+        self._states: dict[str, str] = {}
+        self._last_positions: dict[int, tuple[int, int]] = {}
+
+    def node_stats(self, node_id: str, data: dict) -> str:
+        frames = data.get("frameStats") or {}
+        self.nodes[node_id].append({
+            "time": time.time(),
+            "players": data.get("players", 0),
+            "playing": data.get("playingPlayers", 0),
+            "load": (data.get("cpu") or {}).get("lavalinkLoad", 0.0),
+            "sent": frames.get("sent", 0),
+            "nulled": frames.get("nulled", 0),
+            "deficit": frames.get("deficit", 0)
+        })
+        loss = self.frame_loss(node_id)
+        state = CRITICAL if loss >= self.critical else DEGRADED if loss >= self.degraded else OK
+        self._states[node_id] = state
+        return state
+
+    def frame_loss(self, node_id: str) -> float:
+        samples = list(self.nodes[node_id])[-self.window:]
+        sent = sum(s["sent"] for s in samples)
+        bad = sum(s["nulled"] + s["deficit"] for s in samples)
+        return bad / max(sent + bad, 1)
+
+    def node_state(self, node_id: str) -> str:
+        return self._states.get(node_id, OK)
+
+    def throttled(self, node_id: str) -> bool:
+        return self.node_state(node_id) != OK
+
+    def player_update(self, guild_id: int, node_id: str, state: dict, playing: bool):
+        # drift: how far the position fell behind the wall clock since the last update
+        now, position = state.get("time", 0), state.get("position", 0)
+        last = self._last_positions.get(guild_id)
+        self._last_positions[guild_id] = (now, position)
+        drift = 0
+        if playing and last is not None:
+            elapsed, advanced = now - last[0], position - last[1]
+            if 0 <= advanced <= elapsed * 2:  # seeks and track changes aren't drift
+                drift = max(elapsed - advanced, 0)
+        self.players[guild_id].append({
+            "time": now / 1000,
+            "node": node_id,
+            "ping": state.get("ping", -1),
+            "connected": state.get("connected", True),
+            "drift": drift
+        })
+
+    def player_drift(self, guild_id: int) -> int:
+        return sum(s["drift"] for s in list(self.players[guild_id])[-self.window:])
+
+    def forget_player(self, guild_id: int):
+        self._last_positions.pop(guild_id, None)
+
+    def event(self, guild_id: int, kind: str, detail: str):
+        self.events.append({"time": time.time(), "guild": guild_id, "kind": kind, "detail": detail})
@@ -0,0 +1,52 @@
+import asyncpg
+from ..database.music import sql
+
+DEFAULT_PREFIX = "'"
+
+
+class PrefixCache:
+    """In-memory per-guild prefixes, backed by the `guild_prefixes` table.
+
+    `matcher` returns a precomputed tuple of every accepted prefix (mentions included), so a message can be
+    rejected with a single `str.startswith` before any command parsing happens.
+    """
+
+    def __init__(self, default: str = DEFAULT_PREFIX):
+        self.default = default
+        self.pool: asyncpg.Pool | None = None
+        self._prefixes: dict[int, str] = {}
+        self._matchers: dict[int, tuple[str, ...]] = {}
+
+    @property
+    def persistent(self) -> bool:
+        # without a database, changes only last until the next restart
+        return self.pool is not None
+
+    async def load(self, pool: asyncpg.Pool):
+        rows = await pool.fetch(sql.SELECT_PREFIXES)
+        self.pool = pool
+        self._prefixes = {row['guild_id']: row['prefix'] for row in rows}
+        self._matchers.clear()
+
+    def get(self, guild_id: int) -> str:
+        return self._prefixes.get(guild_id, self.default)
+
+    def matcher(self, guild_id: int, user_id: int) -> tuple[str, ...]:
+        matcher = self._matchers.get(guild_id)
+        if matcher is None:
+            # same order as commands.when_mentioned_or
+            matcher = self._matchers[guild_id] = (f"<@{user_id}> ", f"<@!{user_id}> ", self.get(guild_id))
+        return matcher
+
+    async def set(self, guild_id: int, prefix: str):
+        if self.pool is not None:
+            await self.pool.execute(sql.UPSERT_PREFIX, guild_id, prefix)
+        self._prefixes[guild_id] = prefix
+        self._matchers.pop(guild_id, None)
+
+    async def reset(self, guild_id: int):
+        if self.pool is not None:
+            await self.pool.execute(sql.DELETE_PREFIX, guild_id)
+        self._prefixes.pop(guild_id, None)
+        self._matchers.pop(guild_id, None)
+
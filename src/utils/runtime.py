@@ -0,0 +1,71 @@
+import json
+import asyncio
+from logging import getLogger
+
+import aiohttp
+
+logger = getLogger("discord")
+
+
+def json_dumps(obj) -> str:
+    return json.dumps(obj, separators=(',', ':'))
+
+
+json_loads = json.loads
+
+
+def install_fast_runtime() -> dict[str, str]:
+    """Switches to uvloop and orjson when they are installed, falling back to asyncio / json otherwise.
+
+    discord.py already decodes / encodes the gateway and HTTP with orjson whenever it is installed
+    (`discord.utils.HAS_ORJSON`), so this only changes the loop and the Lavalink traffic of wavelink.
+    Must be called before the event loop is created.
+    """
+    global json_dumps, json_loads
+    runtime = {"loop": "asyncio", "json": "json"}
+
+    try:
+        import uvloop
+    except ImportError:
+        logger.info("uvloop is not installed, using the default asyncio loop.")
+    else:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        runtime["loop"] = "uvloop"
+
+    try:
+        import orjson
+    except ImportError:
+        logger.info("orjson is not installed, using the stdlib json.")
+    else:
+        def json_dumps(obj) -> str:
+            return orjson.dumps(obj).decode('utf-8')
+
+        # wavelink websocket messages and REST responses, through `lavalink_session` only
+        json_loads = orjson.loads
+        runtime["json"] = "orjson"
+
+    logger.info(f"Runtime profile: {runtime}")
+    return runtime
+
+
+class LavalinkResponse(aiohttp.ClientResponse):
+    async def json(self, *, encoding: str | None = None, loads=None, content_type: str | None = "application/json"):
+        return await super().json(encoding=encoding, loads=loads or json_loads, content_type=content_type)
+
+
+class LavalinkWSMessage(aiohttp.WSMessage):
+    __slots__ = ()
+
+    def json(self, *, loads=None):
+        return (loads or json_loads)(self.data)
+
+
+class LavalinkWebSocketResponse(aiohttp.ClientWebSocketResponse):
+    async def receive(self, timeout: float | None = None) -> aiohttp.WSMessage:
+        return LavalinkWSMessage(*await super().receive(timeout))
+
+
+def lavalink_session(password: str) -> aiohttp.ClientSession:
+    # same session wavelink would create, but with the active JSON encoder / decoder
+    return aiohttp.ClientSession(headers={'Authorization': password}, json_serialize=json_dumps,
+                                 response_class=LavalinkResponse, ws_response_class=LavalinkWebSocketResponse)
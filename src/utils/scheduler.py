@@ -0,0 +1,149 @@
+import time
+import asyncio
+from enum import IntEnum
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+request_priority: ContextVar[Priority] = ContextVar("request_priority", default=Priority.INTERACTIVE)
+request_guild: ContextVar[int] = ContextVar("request_guild", default=0)
+
+
+@contextmanager
+def request_context(priority: Priority, guild_id: int = 0):
+    """Sets the priority / guild used by the requests made inside the block (and tasks created from it)."""
+    priority_token = request_priority.set(priority)
+    guild_token = request_guild.set(guild_id)
+    try:
+        yield
+    finally:
+        request_priority.reset(priority_token)
+        request_guild.reset(guild_token)
+
+
+class _NodeState:
+    def __init__(self, limit: int):
+        self.limit: float = limit
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        # per priority: guild id -> waiting futures, rotated for round-robin between guilds
+        self.waiting: list[OrderedDict[int, deque[asyncio.Future]]] = [OrderedDict() for _ in Priority]
+        self.waits = [[0, 0.0, 0.0] for _ in Priority]  # count, total, max
+
+    def queued(self, priority: Priority) -> int:
+        return sum(len(q) for q in self.waiting[priority].values())
+
+    def record_wait(self, priority: Priority, wait: float):
+        stats = self.waits[priority]
+        stats[0] += 1
+        stats[1] += wait
+        stats[2] = max(stats[2], wait)
+
+
+class RequestScheduler:
+    """Limits the concurrent requests per node, serving interactive before background requests
+    and guilds round-robin within a priority.
+
+    The per node limit backs off (halves) on errors or slow responses and grows back on success.
+    """
+
+    def __init__(self, limit: int = 8, min_limit: int = 1, slow: float = 5.0):
+        self.max_limit = limit
+        self.min_limit = min_limit
+        self.slow = slow
+        self._nodes: dict[str, _NodeState] = {}
+
+    def _node(self, node_id: str) -> _NodeState:
+        state = self._nodes.get(node_id)
+        if state is None:
+            state = self._nodes[node_id] = _NodeState(self.max_limit)
+        return state
+
+    @asynccontextmanager
+    async def request(self, node_id: str, priority: Priority | None = None, guild_id: int | None = None):
+        priority = request_priority.get() if priority is None else priority
+        guild_id = request_guild.get() if guild_id is None else int(guild_id)
+        state = self._node(node_id)
+
+        await self._acquire(state, priority, guild_id)
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self._release(state, failed, time.perf_counter() - start)
+
+    async def _acquire(self, state: _NodeState, priority: Priority, guild_id: int):
+        if state.in_flight < int(state.limit) and not any(state.waiting):
+            state.in_flight += 1
+            state.record_wait(priority, 0.0)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        state.waiting[priority].setdefault(guild_id, deque()).append(waiter)
+        start = time.perf_counter()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # slot was handed over just before cancelling, pass it on
+                state.in_flight -= 1
+                self._wake(state)
+            else:
+                queue = state.waiting[priority].get(guild_id)
+                if queue is not None and waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        del state.waiting[priority][guild_id]
+            raise
+        state.record_wait(priority, time.perf_counter() - start)
+
+    def _release(self, state: _NodeState, failed: bool, elapsed: float):
+        state.in_flight -= 1
+        state.requests += 1
+        if failed or elapsed > self.slow:
+            state.errors += failed
+            state.limit = max(self.min_limit, state.limit / 2)
+        else:
+            state.limit = min(self.max_limit, state.limit + 1 / state.limit)
+        self._wake(state)
+
+    @staticmethod
+    def _wake(state: _NodeState):
+        for guilds in state.waiting:
+            while guilds and state.in_flight < int(state.limit):
+                guild_id, queue = next(iter(guilds.items()))
+                waiter = queue.popleft()
+                if queue:
+                    guilds.move_to_end(guild_id)
+                else:
+                    del guilds[guild_id]
+                if waiter.done():
+                    continue
+                state.in_flight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> dict[str, dict]:
+        return {
+            node_id: {
+                "limit": int(state.limit),
+                "in_flight": state.in_flight,
+                "requests": state.requests,
+                "errors": state.errors,
+                "queued": {p.name.lower(): state.queued(p) for p in Priority},
+                "wait_avg": {p.name.lower(): state.waits[p][1] / max(state.waits[p][0], 1) for p in Priority},
+                "wait_max": {p.name.lower(): state.waits[p][2] for p in Priority}
+            }
+            for node_id, state in self._nodes.items()
+        }
+
+
+lavalink_scheduler = RequestScheduler()
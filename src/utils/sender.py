@@ -0,0 +1,90 @@
+import asyncio
+from logging import getLogger
+
+import discord
+from discord.abc import Messageable
+
+logger = getLogger("discord")
+
+
+class _Outgoing:
+    __slots__ = ("embed", "key", "interactive", "waiters")
+
+    def __init__(self, embed: discord.Embed, key: str | None, interactive: bool, waiter: asyncio.Future):
+        self.embed = embed
+        self.key = key
+        self.interactive = interactive
+        self.waiters = [waiter]
+
+
+class ChannelSender:
+    """Merges the embeds sent to a channel within `window` seconds into a single message.
+
+    Embeds sent with the same `key` replace the pending one (e.g. an outdated "Now Playing!"),
+    and interactive replies are flushed right away, ahead of informational embeds.
+    """
+    MAX_EMBEDS = 10
+
+    def __init__(self, window: float = 0.75):
+        self.window = window
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+        self._pending: dict[int, list[_Outgoing]] = {}
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+        self._flushing: set[asyncio.Task] = set()
+
+    def send(self, channel: Messageable, embed: discord.Embed, *,
+             key: str | None = None, interactive: bool = False) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        item = _Outgoing(embed, key, interactive, waiter)
+
+        pending = self._pending.setdefault(channel.id, [])
+        if key is not None:
+            for old in pending:
+                if old.key == key:
+                    # superseded, whoever waited for it gets the newer message
+                    pending.remove(old)
+                    item.waiters.extend(old.waiters)
+                    self.dropped += 1
+                    break
+        if pending:
+            self.merged += 1
+        pending.append(item)
+
+        timer = self._timers.get(channel.id)
+        if timer is None or interactive:
+            if timer is not None:
+                timer.cancel()
+            delay = 0 if interactive else self.window
+            self._timers[channel.id] = loop.call_later(delay, self._start_flush, channel)
+        return waiter
+
+    def _start_flush(self, channel: Messageable):
+        self._timers.pop(channel.id, None)
+        task = asyncio.create_task(self._flush(channel))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, channel: Messageable):
+        items = self._pending.pop(channel.id, [])
+        items.sort(key=lambda i: not i.interactive)
+
+        for i in range(0, len(items), self.MAX_EMBEDS):
+            batch = items[i:i + self.MAX_EMBEDS]
+            try:
+                message = await channel.send(embeds=[item.embed for item in batch])
+            except Exception as e:
+                logger.error(f"Failed to send {len(batch)} embed(s) to channel {channel.id}: {e}")
+                for item in batch:
+                    for waiter in item.waiters:
+                        if not waiter.done():
+                            waiter.set_exception(e)
+                continue
+
+            self.sent += 1
+            for item in batch:
+                for waiter in item.waiters:
+                    if not waiter.done():
+                        waiter.set_result(message)
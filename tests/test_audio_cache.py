@@ -0,0 +1,187 @@
+import os
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+web = pytest.importorskip("aiohttp.web")
+
+from src.utils import AudioCache  # noqa: E402
+
+TRACK_SIZE = 1900
+MAX_BYTES = 8000  # 4 tracks fit, a single one may use at most 2000 bytes
+
+
+async def serve_audio(files: dict[str, bytes]):
+    """Local stand-in for the audio host, serves `files` by name."""
+    async def audio(request: web.Request):
+        body = files.get(request.match_info["name"])
+        if body is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=body, content_type="audio/mpeg")
+
+    app = web.Application()
+    app.router.add_get("/{name}", audio)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+async def play(cache: AudioCache, identifier: str, base: str, times: int = 1):
+    for _ in range(times):
+        cache.record_play(identifier, f"{base}/{identifier}")
+    await asyncio.gather(*list(cache._tasks))
+
+
+def run_with_server(files: dict[str, bytes], test):
+    async def run():
+        runner, base = await serve_audio(files)
+        try:
+            return await test(base)
+        finally:
+            await runner.cleanup()
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def tracks() -> dict[str, bytes]:
+    files = {name: bytes([i]) * TRACK_SIZE for i, name in enumerate("abcde")}
+    files["big"] = b"x" * (MAX_BYTES // 4 + 1)
+    return files
+
+
+def test_promoted_after_min_plays(tmp_path, tracks):
+    async def test(base):
+        cache = AudioCache(str(tmp_path), MAX_BYTES, min_plays=2)
+        await play(cache, "a", base)
+        assert cache.source("a") is None
+        await play(cache, "a", base)
+        source = cache.source("a")
+        await cache.close()
+        return cache, source
+
+    cache, source = run_with_server(tracks, test)
+    assert source == os.path.join(str(tmp_path), AudioCache.key("a"))
+    with open(source, "rb") as f:
+        assert f.read() == tracks["a"]
+    assert cache.fetched == 1
+    assert not [p for p in os.listdir(tmp_path) if p.endswith(".part")]
+
+
+def test_lru_eviction_by_size(tmp_path, tracks):
+    async def test(base):
+        cache = AudioCache(str(tmp_path), MAX_BYTES, min_plays=1)
+        for name in "abcd":
+            await play(cache, name, base)
+        # "a" was played last, "b" is now the least recently played
+        assert cache.source("a") is not None
+        await cache.record_hit("a")
+        await play(cache, "e", base)
+        await cache.close()
+        return cache
+
+    cache = run_with_server(tracks, test)
+    assert cache.evicted == 1
+    assert cache.size == 4 * TRACK_SIZE
+    assert cache.source("b") is None
+    assert all(cache.source(name) is not None for name in "acde")
+    assert not os.path.exists(os.path.join(str(tmp_path), AudioCache.key("b")))
+
+
+def test_oversized_track_is_skipped(tmp_path, tracks):
+    async def test(base):
+        cache = AudioCache(str(tmp_path), MAX_BYTES, min_plays=1)
+        await play(cache, "big", base)
+        await cache.close()
+        return cache
+
+    cache = run_with_server(tracks, test)
+    assert cache.source("big") is None
+    assert cache.fetched == 0
+    assert cache.size == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_hit_miss_and_bytes_saved(tmp_path, tracks):
+    async def test(base):
+        cache = AudioCache(str(tmp_path), MAX_BYTES, min_plays=1)
+        await play(cache, "a", base)
+
+        assert cache.source("a") is not None
+        await cache.record_hit("a")
+        assert cache.source("a") is not None
+        await cache.record_hit("a")
+        # found on disk but Lavalink couldn't load it
+        assert cache.source("a") is not None
+        cache.record_miss()
+        assert cache.source("c") is None
+        await cache.close()
+        return cache
+
+    cache = run_with_server(tracks, test)
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["bytes_saved"] == 2 * TRACK_SIZE
+
+
+def test_rescans_cached_files_on_start(tmp_path, tracks):
+    async def test(base):
+        cache = AudioCache(str(tmp_path), MAX_BYTES, min_plays=1)
+        await play(cache, "a", base)
+        await cache.close()
+
+    run_with_server(tracks, test)
+    cache = AudioCache(str(tmp_path), MAX_BYTES)
+    assert cache.size == TRACK_SIZE
+    assert cache.source("a") is not None
+
+
+def test_play_counts_stay_bounded(tmp_path):
+    cache = AudioCache(str(tmp_path), MAX_BYTES, top_n=2, min_plays=100, max_tracked=10)
+    for _ in range(5):
+        cache.record_play("popular", "http://localhost/popular")
+    for i in range(50):
+        cache.record_play(f"once{i}", f"http://localhost/once{i}")
+
+    assert len(cache.plays) <= 10
+    assert cache.plays["popular"] == 5
+
+
+def test_close_waits_for_cancelled_fetches(tmp_path):
+    async def test():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def slow_audio(request: web.Request):
+            resp = web.StreamResponse()
+            await resp.prepare(request)
+            await resp.write(b"x" * 100)
+            started.set()
+            await release.wait()
+            return resp
+
+        app = web.Application()
+        app.router.add_get("/{name}", slow_audio)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        try:
+            cache = AudioCache(str(tmp_path), MAX_BYTES, min_plays=1)
+            cache.record_play("slow", f"http://{host}:{port}/slow")
+            tasks = list(cache._tasks)
+            await asyncio.wait_for(started.wait(), timeout=5)
+            await asyncio.wait_for(cache.close(), timeout=5)
+            return cache, tasks
+        finally:
+            release.set()
+            await runner.cleanup()
+
+    cache, tasks = asyncio.run(test())
+    assert all(task.done() for task in tasks)
+    assert cache._session.closed
+    assert os.listdir(tmp_path) == []
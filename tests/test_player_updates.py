@@ -0,0 +1,272 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("discord")
+pytest.importorskip("wavelink")
+
+from wavelink import Filter, Timescale  # noqa: E402
+from src.cogs.music import PlayerUpdateBatcher, TPlayer, TTrack  # noqa: E402
+
+
+class FakeNode:
+    """Stands in for a wavelink node, records every request instead of sending it."""
+
+    def __init__(self, fail: Exception | None = None, node_id: str = "node"):
+        self.id = node_id
+        self._session_id = "session"
+        self.fail = fail
+        self.requests = []
+        self.client = object()
+        self._players = {}
+
+    @property
+    def players(self):
+        return self._players
+
+    async def _send(self, *, method: str, path: str, guild_id=None, query=None, data=None):
+        self.requests.append((method, path, guild_id, data))
+        if self.fail is not None:
+            raise self.fail
+        if data and data.get("encodedTrack"):
+            return {"track": {"encoded": data["encodedTrack"]}}
+        return {}
+
+
+def make_track(identifier: str = "abc", length: int = 180_000) -> TTrack:
+    return TTrack({"encoded": f"encoded-{identifier}", "info": {
+        "identifier": identifier, "title": identifier, "author": "author", "length": length,
+        "uri": f"https://youtu.be/{identifier}", "isSeekable": True, "isStream": False, "position": 0}})
+
+
+def make_player(node: FakeNode, playing: bool = True) -> TPlayer:
+    player = TPlayer(nodes=[node])
+    player._guild = SimpleNamespace(id=1)
+    if playing:
+        player._current = make_track()
+        player.last_update = datetime.datetime.now(datetime.timezone.utc)
+        player.last_position = 30_000
+    return player
+
+
+def sent(node: FakeNode) -> list[dict]:
+    return [data for *_, data in node.requests]
+
+
+def make_batcher(node: FakeNode, tick: float = 0.05) -> PlayerUpdateBatcher:
+    player = SimpleNamespace(current_node=node, guild=SimpleNamespace(id=1))
+    return PlayerUpdateBatcher(player, tick=tick)
+
+
+def test_burst_within_a_tick_is_one_patch():
+    async def run():
+        node = FakeNode()
+        batcher = make_batcher(node)
+        waiters = [batcher.update(volume=v) for v in (10, 20, 30)]
+        waiters.append(batcher.update(position=5000))
+        waiters.append(batcher.update(paused=True))
+        await asyncio.gather(*waiters)
+        return node, batcher
+
+    node, batcher = asyncio.run(run())
+    assert node.requests == [("PATCH", "sessions/session/players", 1, {"volume": 30, "position": 5000, "paused": True})]
+    assert batcher.sent == 1
+    assert batcher.merged == 4
+
+
+def test_separate_ticks_are_separate_patches():
+    async def run():
+        node = FakeNode()
+        batcher = make_batcher(node, tick=0.01)
+        await batcher.update(volume=10)
+        await batcher.update(volume=20)
+        return node
+
+    node = asyncio.run(run())
+    assert [data for *_, data in node.requests] == [{"volume": 10}, {"volume": 20}]
+
+
+def test_skip_flushes_immediately_and_drops_pending_position():
+    async def run():
+        node = FakeNode()
+        # a tick long enough that only an immediate flush can send within the test
+        batcher = make_batcher(node, tick=10)
+        seek = batcher.update(position=5000, volume=50)
+        await asyncio.wait_for(batcher.skip(), timeout=1)
+        await seek
+        return node
+
+    node = asyncio.run(run())
+    assert [data for *_, data in node.requests] == [{"volume": 50, "encodedTrack": None}]
+
+
+def test_failed_send_reaches_every_waiter():
+    async def run():
+        node = FakeNode(fail=RuntimeError("node down"))
+        batcher = make_batcher(node)
+        waiters = [batcher.update(volume=10), batcher.update(paused=True)]
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert batcher.sent == 0
+
+
+def test_close_resolves_pending_waiters():
+    async def run():
+        node = FakeNode()
+        batcher = make_batcher(node, tick=10)
+        waiter = batcher.update(volume=10)
+        batcher.close()
+        await asyncio.wait_for(waiter, timeout=1)
+        return node
+
+    node = asyncio.run(run())
+    assert node.requests == []
+
+
+def test_player_volume_and_seek_burst_is_one_patch():
+    async def run():
+        node = FakeNode()
+        player = make_player(node)
+        await asyncio.gather(player.set_volume(80), player.set_volume(120), player.seek(60_000))
+        return node, player
+
+    node, player = asyncio.run(run())
+    assert sent(node) == [{"volume": 120, "position": 60_000}]
+    assert player.volume == 120
+
+
+def test_player_skip_drops_pending_seek():
+    async def run():
+        node = FakeNode()
+        player = make_player(node)
+        player.updates.tick = 10
+        seek = asyncio.create_task(player.seek(60_000))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(player.skip(), timeout=1)
+        await seek
+        return node, player
+
+    node, player = asyncio.run(run())
+    assert sent(node) == [{"encodedTrack": None}]
+    assert player._player_state["track"] is None
+    assert player.queue._loaded is None
+
+
+def test_player_filter_with_seek_merges_into_one_patch():
+    async def run():
+        node = FakeNode()
+        player = make_player(node)
+        _filter = Filter(timescale=Timescale(speed=1.2))
+        await asyncio.gather(player.set_volume(80), player.set_filter(_filter, seek=True))
+        return node
+
+    node = asyncio.run(run())
+    assert len(node.requests) == 1
+    data = sent(node)[0]
+    assert data["volume"] == 80
+    assert data["filters"] == {"timescale": {"speed": 1.2, "pitch": 1.0, "rate": 1.0}}
+    assert 30_000 <= data["position"] < 31_000
+
+
+def test_player_play_drops_pending_seek():
+    async def run():
+        node = FakeNode()
+        player = make_player(node)
+        seek = asyncio.create_task(player.seek(60_000))
+        await asyncio.sleep(0)
+        await player.play(make_track("next"))
+        await seek
+        return node
+
+    node = asyncio.run(run())
+    # only the play itself, the seek was for the previous track
+    assert sent(node) == [{"encodedTrack": "encoded-next", "position": 0, "volume": 50}]
+
+
+def test_player_pause_reverts_when_the_update_fails():
+    async def run():
+        node = FakeNode(fail=RuntimeError("node down"))
+        player = make_player(node)
+        with pytest.raises(RuntimeError):
+            await player.pause()
+        paused_after_failure = player.is_paused()
+
+        # a pause and resume batched together, both lost
+        results = await asyncio.gather(player.pause(), player.resume(), return_exceptions=True)
+        return paused_after_failure, player, results
+
+    paused_after_failure, player, results = asyncio.run(run())
+    assert paused_after_failure is False
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert player.is_paused() is False
+
+
+def test_player_pause_sticks_when_the_update_succeeds():
+    async def run():
+        node = FakeNode()
+        player = make_player(node)
+        await player.pause()
+        return node, player
+
+    node, player = asyncio.run(run())
+    assert sent(node) == [{"paused": True}]
+    assert player.is_paused() is True
+
+
+def make_moving_player(old: FakeNode) -> TPlayer:
+    player = make_player(old)
+    old._players[1] = player
+    player._player_state.update(voice={"sessionId": "s", "token": "t", "endpoint": "e"}, track="encoded-abc")
+    player._volume = 80
+    player._paused = True
+    player._filter = Filter(timescale=Timescale(speed=1.2))
+    return player
+
+
+def test_move_to_node_sends_the_full_state_then_switches():
+    async def run():
+        old, new = FakeNode(node_id="old"), FakeNode(node_id="new")
+        player = make_moving_player(old)
+        await player.move_to_node(new)
+        return old, new, player
+
+    old, new, player = asyncio.run(run())
+    assert player.current_node is new
+    assert new._players == {1: player} and old._players == {}
+    data = sent(new)[0]
+    assert data["voice"] == {"sessionId": "s", "token": "t", "endpoint": "e"}
+    assert data["encodedTrack"] == "encoded-abc"
+    assert (data["volume"], data["paused"]) == (80, True)
+    assert data["filters"] == {"timescale": {"speed": 1.2, "pitch": 1.0, "rate": 1.0}}
+    assert [method for method, *_ in old.requests] == ["DELETE"]
+
+
+def test_move_to_node_stays_put_when_the_new_node_fails():
+    async def run():
+        old, new = FakeNode(node_id="old"), FakeNode(fail=RuntimeError("new down"), node_id="new")
+        player = make_moving_player(old)
+        with pytest.raises(RuntimeError):
+            await player.move_to_node(new)
+        return old, new, player
+
+    old, new, player = asyncio.run(run())
+    assert player.current_node is old
+    assert old._players == {1: player} and new._players == {}
+    assert old.requests == []
+
+
+def test_move_to_node_moves_even_when_the_old_node_fails():
+    async def run():
+        old, new = FakeNode(fail=RuntimeError("old down"), node_id="old"), FakeNode(node_id="new")
+        player = make_moving_player(old)
+        await player.move_to_node(new)
+        return old, new, player
+
+    old, new, player = asyncio.run(run())
+    assert player.current_node is new
+    assert new._players == {1: player} and old._players == {}